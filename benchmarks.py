@@ -0,0 +1,787 @@
+"""
+Quick benchmarks for the School Management System modules.
+
+Run with:  python benchmarks.py
+
+The hot-path suite times each module's everyday operations at several sizes
+and writes the results as JSON, so two versions can be compared:
+
+    python benchmarks.py suite --sizes 1000,10000,100000 --json new.json
+    python benchmarks.py compare old.json new.json
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# The implementation lives in a file with a space in its name, so load it by path
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_spec = importlib.util.spec_from_file_location(
+    "school", os.path.join(_HERE, "code implementation.py"))
+school = importlib.util.module_from_spec(_spec)
+sys.modules["school"] = school
+_spec.loader.exec_module(school)
+
+
+def sequential_ids(n: int):
+    """Student IDs the way the registrar issues them: S000001, S000002, ..."""
+    return [f"S{i:06d}" for i in range(1, n + 1)]
+
+
+def random_ids(n: int, rng: random.Random):
+    """n distinct student IDs in no particular order, e.g. transfers from other schools."""
+    return [f"S{number:09d}" for number in rng.sample(range(10 ** 9), n)]
+
+
+def enrolment_burst(ids, course_ids, rng: random.Random, requests_per_student: int = 2):
+    """Registration requests as they arrive when enrolment opens: shuffled, with repeats."""
+    burst = [(student_id, rng.choice(course_ids)) for student_id in ids
+             for _ in range(requests_per_student)]
+    rng.shuffle(burst)
+    return burst
+
+
+def payment_stream(ids, rng: random.Random, total_fee: float = 1500.0):
+    """(student_id, amount_paid, total_fee) with about a third of students fully paid."""
+    return [(student_id, total_fee if rng.random() < 0.33 else float(rng.randrange(0, 1500)),
+             total_fee) for student_id in ids]
+
+
+def score_matrix(ids, rng: random.Random, assessments: int = 6):
+    """(student_id, scores) rows, scores roughly normal around 70."""
+    return [(student_id, [round(min(100.0, max(0.0, rng.gauss(70, 12))), 1)
+                          for _ in range(assessments)]) for student_id in ids]
+
+
+def bench_fee_tree_depth(n: int = 4000):
+    """Insert sequential IDs into the plain BST and the AVL tree and compare depth."""
+    print(f"\n=== FEE TRACKING: {n} SEQUENTIAL IDS ===")
+    ids = sequential_ids(n)
+    for balanced in (False, True):
+        fees = school.FeeTracking(balanced=balanced)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for student_id in ids:
+                fees.add_payment_record(student_id, 500, 1000)
+        insert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for student_id in ids:
+            fees._search_node(student_id)
+        search_time = time.perf_counter() - start
+
+        label = "AVL tree " if balanced else "plain BST"
+        print(f"{label}: height = {fees.tree_height():6d}, "
+              f"insert = {insert_time:.3f}s, search = {search_time:.3f}s")
+
+
+def stress_concurrent_enrolment(workers: int = 8, courses: int = 50,
+                                requests: int = 100000, seed: int = 1):
+    """
+    Hammer the registration queue from several threads and check that no
+    course ever ends up with more students than seats.
+    
+    First with raw threads calling process_batch (checks seat reservation is
+    atomic), then with process_queue_concurrent (also checks that each course
+    was filled first-come, first-served).
+    """
+    print(f"\n=== CONCURRENT ENROLMENT: {requests} REQUESTS, {workers} WORKERS ===")
+    rng = random.Random(seed)
+    course_ids = [f"C{i:04d}" for i in range(courses)]
+    stream = [(f"S{rng.randrange(requests // 2):06d}", rng.choice(course_ids))
+              for _ in range(requests)]
+
+    def make_scheduler():
+        scheduler = school.CourseScheduler()
+        scheduler.course_capacity = {c: rng.randint(1, 200) for c in course_ids}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for student_id, course_id in stream:
+                scheduler.enrol_student_request(student_id, course_id)
+        return scheduler
+
+    def check_capacity(scheduler):
+        for course_id, enrolled in scheduler.course_allocations.items():
+            assert len(enrolled) <= scheduler.course_capacity[course_id], \
+                f"{course_id} overbooked: {len(enrolled)} seats taken"
+        for student_id, taken in scheduler.student_courses.items():
+            for course_id in taken:
+                assert student_id in scheduler.course_allocations[course_id]
+
+    # Make threads switch as often as possible to shake out races
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        scheduler = make_scheduler()
+        threads = [threading.Thread(target=scheduler.process_batch, args=(requests,))
+                   for _ in range(workers)]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        elapsed = time.perf_counter() - start
+        check_capacity(scheduler)
+        print(f"process_batch threads   : {elapsed:.3f}s, no course overbooked")
+
+        scheduler = make_scheduler()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            scheduler.process_queue_concurrent(workers)
+        elapsed = time.perf_counter() - start
+        check_capacity(scheduler)
+        # Each course should hold exactly the first distinct students who asked
+        expected = {}
+        for student_id, course_id in stream:
+            seats = expected.setdefault(course_id, {})
+            if len(seats) < scheduler.course_capacity[course_id]:
+                seats[student_id] = None
+        for course_id, seats in expected.items():
+            assert list(scheduler.course_allocations[course_id]) == list(seats), \
+                f"{course_id} not filled in arrival order"
+        print(f"process_queue_concurrent: {elapsed:.3f}s, no course overbooked, FIFO kept")
+    finally:
+        sys.setswitchinterval(old_interval)
+
+
+def bench_waitlist(courses: int = 2000, requests: int = 1000000, drops: int = 100000):
+    """
+    Load capacities for many courses, push a burst of requests through the
+    queue (most courses overflow into their waitlists), then time drops,
+    each of which promotes the next student on the waitlist.
+    """
+    print(f"\n=== WAITLISTS: {courses} COURSES, {requests} REQUESTS, {drops} DROPS ===")
+    rng = random.Random(6)
+    capacities = [(f"C{i:05d}", rng.randint(20, 300)) for i in range(courses)]
+    scheduler = school.CourseScheduler(course_capacity={})
+    scheduler.load_course_capacity(capacities)
+    students = sequential_ids(requests // 2)
+    scheduler.seniority.update((student_id, rng.randrange(4)) for student_id in students)
+    for student_id, course_id in enrolment_burst(students, [c for c, _ in capacities], rng):
+        scheduler._enqueue(student_id, course_id)
+
+    process_time, _ = _timed(scheduler.process_queue)
+    waiting = sum(len(live) for live in scheduler._waitlisted.values())
+    seats = [(student_id, course_id) for course_id, enrolled in scheduler.course_allocations.items()
+             for student_id in enrolled]
+    leaving = rng.sample(seats, min(drops, len(seats)))
+
+    def drop_all():
+        for student_id, course_id in leaving:
+            scheduler._drop(student_id, course_id)
+
+    drop_time, _ = _timed(drop_all)
+    promoted = waiting - sum(len(live) for live in scheduler._waitlisted.values())
+    for course_id, capacity in capacities:
+        assert len(scheduler.course_allocations.get(course_id, ())) <= capacity
+    print(f"process_queue = {process_time:.3f}s ({waiting} waitlisted), "
+          f"{len(leaving)} drops = {drop_time:.3f}s "
+          f"({drop_time / len(leaving) * 1e6:.2f} us each, {promoted} promoted)")
+
+
+def bench_timetable(students: int = 100000, courses: int = 2000, per_student: int = 5):
+    """
+    Give every course a weekly timetable, enrol students through the clash
+    check, then bulk-load a second batch that skips it and time a full
+    find_conflicts sweep over everyone.
+    """
+    print(f"\n=== TIMETABLE: {students} STUDENTS, {courses} COURSES ===")
+    rng = random.Random(7)
+    course_ids = [f"C{i:05d}" for i in range(courses)]
+    scheduler = school.CourseScheduler(course_capacity={c: students for c in course_ids})
+    meetings = []
+    for course_id in course_ids:
+        for day in rng.sample(range(5), 2):
+            start = rng.randrange(8, 18) * 60
+            meetings.append((course_id, day, start, start + rng.choice((50, 80, 110))))
+    scheduler.load_course_meetings(meetings)
+    ids = sequential_ids(students)
+    requests = [(student_id, rng.choice(course_ids)) for student_id in ids
+                for _ in range(per_student)]
+
+    def enrol_checked():
+        outcomes = Counter()
+        for student_id, course_id in requests:
+            outcomes[scheduler._try_enrol(student_id, course_id)] += 1
+        return outcomes
+
+    enrol_time, outcomes = _timed(enrol_checked)
+    # Enrolments loaded from old data aren't checked, so some students do clash
+    scheduler.bulk_load((student_id, rng.choice(course_ids)) for student_id in ids)
+    sweep_time, conflicts = _timed(lambda: sum(1 for _ in scheduler.find_conflicts()))
+    print(f"{len(requests)} checked requests = {enrol_time:.3f}s "
+          f"({enrol_time / len(requests) * 1e6:.2f} us each, {outcomes['conflict']} clashes refused)")
+    print(f"find_conflicts over {students} students = {sweep_time:.3f}s ({conflicts} clashes)")
+
+
+def bench_report_cards(n: int = 100000):
+    """
+    Generate term-end report cards for n students with one worker and with
+    a process per core, and check both produce the same file. The snapshot
+    (taken serially either way) is timed on its own.
+    """
+    cores = os.cpu_count() or 1
+    print(f"\n=== REPORT CARDS: {n} STUDENTS, {cores} CORE(S) ===")
+    rng = random.Random(8)
+    ids = sequential_ids(n)
+    manager = school.SchoolManager(output=school.NullSink())
+    manager.student_registry.bulk_load((sid, f"Student {sid}", "CS101") for sid in ids)
+    manager.fee_tracking.bulk_load(payment_stream(ids, rng))
+    manager.performance_analytics.bulk_load(score_matrix(ids, rng))
+    course_ids = [f"C{i:03d}" for i in range(200)]
+    manager.course_scheduler.load_course_capacity({course_id: n for course_id in course_ids})
+    manager.course_scheduler.bulk_load(enrolment_burst(ids, course_ids, rng, 3))
+
+    snapshot_time, _ = _timed(manager._report_snapshot)
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = []
+        for workers in sorted({1, cores, max(cores, 4)}):
+            path = os.path.join(tmp, f"cards-{workers}.txt")
+            elapsed, written = _timed(manager.generate_report_cards, path, None, workers)
+            assert written == n
+            outputs.append(path)
+            print(f"workers = {workers:2d}: {elapsed:.3f}s ({n / elapsed:,.0f} cards/s)")
+        with open(outputs[0], "rb") as first, open(outputs[-1], "rb") as last:
+            assert first.read() == last.read(), "parallel output differs from serial"
+    print(f"snapshot alone = {snapshot_time:.3f}s")
+
+
+def bench_metrics_overhead(n: int = 200000):
+    """
+    Time a stream of payment lookups and updates with metrics off, on, and
+    off again, and check that turning them off really restores the plain
+    methods.
+    """
+    print(f"\n=== METRICS OVERHEAD: {n} CALLS PER PATH ===")
+    rng = random.Random(9)
+    ids = sequential_ids(n)
+    manager = school.SchoolManager(output=school.NullSink())
+    fees = manager.fee_tracking
+    fees.bulk_load(payment_stream(ids, rng))
+    lookups = [rng.choice(ids) for _ in range(n)]
+
+    def search():
+        search_payment_record = fees.search_payment_record
+        for student_id in lookups:
+            search_payment_record(student_id)
+
+    def update():
+        update_payment_record = fees.update_payment_record
+        for student_id in lookups:
+            update_payment_record(student_id, 750.0)
+
+    for label, path in (("search_payment_record", search), ("update_payment_record", update)):
+        off_time, _ = _timed(path)
+        manager.enable_metrics()
+        on_time, _ = _timed(path)
+        metrics = manager.disable_metrics()
+        again_time, _ = _timed(path)
+        assert metrics.operations[('fee_tracking', label)][0] == n
+        assert label not in vars(fees), "disable_metrics left a wrapper behind"
+        print(f"{label:21s}: off = {off_time / n * 1e9:6.0f} ns, on = {on_time / n * 1e9:6.0f} ns "
+              f"({(on_time - off_time) / n * 1e9:+.0f} ns), off again = {again_time / n * 1e9:6.0f} ns")
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def bench_bulk_load(n: int = 100000):
+    """
+    Load the same roster record by record (printing through a ConsoleSink,
+    as the menus do) and through each module's bulk_load, and compare.
+    
+    The per-record output goes to os.devnull rather than a terminal, so the
+    numbers are a lower bound on what the interactive path costs.
+    """
+    print(f"\n=== BULK LOAD VS PER-RECORD: {n} RECORDS ===")
+    ids = sequential_ids(n)
+    rng = random.Random(2)
+    students = [(sid, f"Student {sid}", f"C{rng.randrange(200):03d}") for sid in ids]
+    payments = [(sid, float(rng.randrange(0, 1500)), 1500.0) for sid in ids]
+    books = [(f"ISBN{i:07d}", f"Book title {i}", rng.randint(1, 5)) for i in range(n)]
+    scores = [(sid, [float(rng.randrange(40, 100)) for _ in range(4)]) for sid in ids]
+
+    def one_by_one(make, method, rows):
+        module = make(output=school.ConsoleSink())
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for row in rows:
+                getattr(module, method)(*row)
+
+    def in_bulk(make, rows):
+        make().bulk_load(rows)
+
+    cases = [
+        ("StudentRegistry", school.StudentRegistry, "register_student", students),
+        ("FeeTracking", school.FeeTracking, "add_payment_record", payments),
+        ("LibrarySystem", school.LibrarySystem, "add_book", books),
+        ("PerformanceAnalytics", school.PerformanceAnalytics, "add_performance_record", scores),
+    ]
+    for name, make, method, rows in cases:
+        slow, _ = _timed(one_by_one, make, method, rows)
+        fast, _ = _timed(in_bulk, make, rows)
+        print(f"{name:21s}: per-record = {slow:.3f}s, bulk_load = {fast:.3f}s "
+              f"({slow / fast:.1f}x)")
+
+
+def bench_cold_start(n: int = 100000):
+    """Save n students' worth of data to a SchoolStore and time loading it back."""
+    print(f"\n=== PERSISTENCE: COLD START WITH {n} STUDENTS ===")
+    ids = sequential_ids(n)
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "school.db")
+        manager = school.SchoolManager(path)
+        start = time.perf_counter()
+        manager.student_registry.bulk_load(
+            (sid, f"Student {sid}", "CS101") for sid in ids)
+        manager.fee_tracking.bulk_load(
+            (sid, float(rng.randrange(0, 1500)), 1500.0) for sid in ids)
+        manager.performance_analytics.bulk_load(
+            (sid, [float(rng.randrange(40, 100)) for _ in range(4)]) for sid in ids)
+        manager.library_system.bulk_load(
+            (f"ISBN{i:07d}", f"Book title {i}", 3) for i in range(n // 10))
+        manager.close()
+        save_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        manager = school.SchoolManager(path)
+        open_time = time.perf_counter() - start
+        module_times = {}
+        for name in school.SchoolManager.MODULES:
+            start = time.perf_counter()
+            getattr(manager, name)
+            module_times[name] = time.perf_counter() - start
+        assert len(manager.student_registry.students) == n
+        manager.close()
+
+        manager = school.SchoolManager(path)
+        manager.fee_tracking
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for sid in ids[:10000]:
+                manager.fee_tracking.update_payment_record(sid, 1500.0)
+        manager.close()
+        update_time = time.perf_counter() - start
+    print(f"initial save = {save_time:.3f}s, open = {open_time * 1000:.1f}ms, "
+          f"10000 payment updates = {update_time:.3f}s")
+    for name, seconds in module_times.items():
+        print(f"  first use of {name:21s}: {seconds:.3f}s")
+
+
+def bench_ledger_replay(n: int = 100000, payments: int = 300000):
+    """
+    Write a payment ledger, then time rebuilding the fee tree from the full
+    log and from a checkpoint plus the tail written after it.
+    """
+    print(f"\n=== PAYMENT LEDGER: {n} STUDENTS, {payments} PAYMENTS ===")
+    ids = sequential_ids(n)
+    rng = random.Random(4)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payments.log")
+        ledger = school.PaymentLedger(path)
+        fees = school.FeeTracking()
+        fees.ledger = ledger
+        start = time.perf_counter()
+        fees.bulk_load((sid, 0.0, 1500.0) for sid in ids)
+        for _ in range(payments):
+            fees._apply_payment(rng.choice(ids), 10.0)
+        ledger.flush()
+        write_time = time.perf_counter() - start
+
+        def replay():
+            rebuilt = school.FeeTracking()
+            replayed = school.PaymentLedger(path)
+            replayed.restore(rebuilt)
+            replayed.close()
+            return rebuilt
+
+        full_time, rebuilt = _timed(replay)
+        assert rebuilt.fee_totals() == fees.fee_totals()
+        ledger.checkpoint(fees)
+        for _ in range(payments // 100):
+            fees._apply_payment(rng.choice(ids), 10.0)
+        ledger.close()
+        tail_time, rebuilt = _timed(replay)
+        assert rebuilt.fee_totals() == fees.fee_totals()
+    print(f"write = {write_time:.3f}s, full replay = {full_time:.3f}s, "
+          f"checkpoint + {payments // 100} entries = {tail_time:.3f}s")
+
+
+def check_exact_payment_updates(updates: int = 10000):
+    """
+    update_payment_record must store the new amount exactly, live and after
+    a ledger replay, so a student who has paid in full reads as Cleared.
+    """
+    print(f"\n=== EXACT PAYMENT UPDATES: {updates} UPDATES ===")
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payments.log")
+        fees = school.FeeTracking()
+        fees.ledger = school.PaymentLedger(path)
+        # The reported case: overpaid, then corrected down to exactly the fee
+        fees.add_payment_record("S", 4507.14, 152.95)
+        fees.update_payment_record("S", 152.95)
+        record = fees.search_payment_record("S")
+        assert record['amount_paid'] == 152.95 and record['balance'] == 0, record
+        assert record['status'] == "Cleared", record
+        ids = sequential_ids(100)
+        fees.bulk_load((sid, 0.0, 1500.0) for sid in ids)
+        expected = {}
+        for _ in range(updates):
+            sid = rng.choice(ids)
+            expected[sid] = rng.randrange(0, 300000) / 100
+            fees.update_payment_record(sid, expected[sid])
+        fees.ledger.close()
+        rebuilt = school.FeeTracking()
+        replayed = school.PaymentLedger(path)
+        replayed.restore(rebuilt)
+        replayed.close()
+        for tree in (fees, rebuilt):
+            assert tree.search_payment_record("S")["status"] == "Cleared"
+            for sid, amount in expected.items():
+                assert tree._search_node(sid).amount_paid == amount, (sid, amount)
+    print(f"{len(expected)} students updated, every amount exact live and after replay")
+
+
+async def _http_request(reader, writer, method, path, body=None):
+    """Send one keep-alive request and read back (status, decoded JSON)."""
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def bench_http_server(students: int = 5000, requests: int = 50000,
+                      connections: int = 50, write_share: float = 0.2):
+    """
+    Start the JSON API in its own process (one core) and drive it with
+    keep-alive clients: mostly student/payment/performance reads plus a share
+    of payment and enrolment writes. Reports requests per second and latency.
+    """
+    print(f"\n=== HTTP API: {requests} REQUESTS OVER {connections} CONNECTIONS ===")
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(_HERE, "code implementation.py"), "--serve=0"],
+        stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(server.stdout.readline().rsplit(":", 1)[1])
+        ids = sequential_ids(students)
+
+        async def seed():
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            for sid in ids:
+                await _http_request(reader, writer, "POST", "/students",
+                                    {"student_id": sid, "name": f"Student {sid}",
+                                     "course_id": "CS101"})
+                await _http_request(reader, writer, "POST", "/payments",
+                                    {"student_id": sid, "amount_paid": 0, "total_fee": 1500})
+                await _http_request(reader, writer, "PUT", f"/performance/{sid}",
+                                    {"scores": [70, 80, 90]})
+            writer.close()
+
+        async def client(n, rng, latencies):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            for _ in range(n):
+                sid = rng.choice(ids)
+                roll = rng.random()
+                if roll < write_share / 2:
+                    request = ("POST", f"/payments/{sid}/transactions", {"amount": 10})
+                elif roll < write_share:
+                    request = ("POST", "/enrolments", {"student_id": sid, "course_id": "MATH201"})
+                else:
+                    request = ("GET", rng.choice((f"/students/{sid}", f"/payments/{sid}",
+                                                  f"/performance/{sid}")))
+                start = time.perf_counter()
+                status, _ = await _http_request(reader, writer, *request)
+                latencies.append(time.perf_counter() - start)
+                assert status < 500, status
+            writer.close()
+
+        async def run():
+            await seed()
+            latencies = []
+            rng = random.Random(5)
+            start = time.perf_counter()
+            await asyncio.gather(*(client(requests // connections, random.Random(rng.random()),
+                                          latencies) for _ in range(connections)))
+            return time.perf_counter() - start, sorted(latencies)
+
+        elapsed, latencies = asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{len(latencies) / elapsed:,.0f} requests/s, p50 = {p50:.2f}ms, p99 = {p99:.2f}ms")
+
+
+def _quietly(fn, *args):
+    """Time fn(*args) with its printing sent to os.devnull."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return _timed(fn, *args)
+
+
+def _hot_paths(n: int, make_output):
+    """
+    Yield (benchmark, operations, seconds) for each module's hot paths at size n.
+    
+    Every size gets its own fixed seed, so two runs see the same data. Each
+    module gets its messages sink from make_output().
+    """
+    rng = random.Random(n)
+    ordered = sequential_ids(n)
+    shuffled = random_ids(n, rng)
+
+    for label, ids in (("sequential", ordered), ("random", shuffled)):
+        registry = school.StudentRegistry(output=make_output())
+
+        def register():
+            for student_id in ids:
+                registry.register_student(student_id, f"Student {student_id}", "CS101")
+
+        yield f"register_student[{label}]", n, _quietly(register)[0]
+
+    course_ids = [f"C{i:04d}" for i in range(max(1, n // 100))]
+    scheduler = school.CourseScheduler(output=make_output())
+    scheduler.course_capacity = {course_id: 150 for course_id in course_ids}
+    burst = enrolment_burst(ordered, course_ids, rng)
+
+    def enqueue():
+        for student_id, course_id in burst:
+            scheduler.enrol_student_request(student_id, course_id)
+
+    yield "enrol_student_request", len(burst), _quietly(enqueue)[0]
+    yield "process_queue", len(burst), _quietly(scheduler.process_queue)[0]
+
+    for label, ids in (("sequential", ordered), ("random", shuffled)):
+        fees = school.FeeTracking(output=make_output())
+        payments = payment_stream(ids, rng)
+
+        def add_payments():
+            for record in payments:
+                fees.add_payment_record(*record)
+
+        def search():
+            for student_id in ids:
+                fees._search_node(student_id)
+
+        yield f"add_payment_record[{label}]", n, _quietly(add_payments)[0]
+        yield f"_search_node[{label}]", n, _timed(search)[0]
+
+    library = school.LibrarySystem(output=make_output())
+    isbns = [f"ISBN{i:07d}" for i in range(max(1, n // 10))]
+    library.bulk_load((isbn, f"Book title {i}", 20) for i, isbn in enumerate(isbns))
+    loans = [(rng.choice(isbns), student_id) for student_id in ordered]
+
+    def borrow():
+        for isbn, student_id in loans:
+            library.borrow_book(isbn, student_id)
+
+    def give_back():
+        for isbn, student_id in loans:
+            library.return_book(isbn, student_id)
+
+    yield "borrow_book", n, _quietly(borrow)[0]
+    yield "return_book", n, _quietly(give_back)[0]
+
+    analytics = school.PerformanceAnalytics(output=make_output())
+    analytics.bulk_load(score_matrix(ordered, rng))
+    yield "display_top_performer[k=10]", 1, _quietly(analytics.display_top_performer, 10)[0]
+    yield "view_all_rankings", n, _quietly(analytics.view_all_rankings)[0]
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes=(1000, 10000, 100000), json_path=None, sink="console"):
+    """
+    Time every module's hot paths at each size and return the results.
+    
+    With sink="console" messages are formatted and printed to os.devnull, as
+    the menus would, so the numbers cover the data structure work plus string
+    formatting but not terminal speed. sink="null" measures the embedded
+    default, where nothing is formatted at all. With json_path the results
+    (and the commit and Python version they came from) are also written there
+    for compare_results.
+    """
+    make_output = school.ConsoleSink if sink == "console" else school.NullSink
+    print(f"\n=== HOT-PATH SUITE ({sink} sink): SIZES {', '.join(map(str, sizes))} ===")
+    results = []
+    for n in sizes:
+        for benchmark, operations, seconds in _hot_paths(n, make_output):
+            results.append({'benchmark': benchmark, 'n': n, 'operations': operations,
+                            'seconds': round(seconds, 6),
+                            'us_per_op': round(seconds / operations * 1e6, 3)})
+            print(f"n={n:<8d} {benchmark:32s} {seconds:9.4f}s "
+                  f"{results[-1]['us_per_op']:10.3f} us/op")
+    report = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sink': sink,
+        'created_at': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        'results': results,
+    }
+    if json_path:
+        with open(json_path, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Results written to {json_path}")
+    return report
+
+
+def compare_results(old_path: str, new_path: str, threshold: float = 1.2):
+    """Print old vs new time per operation; anything threshold times slower is flagged."""
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+    baseline = {(r['benchmark'], r['n']): r['us_per_op'] for r in old['results']}
+    print(f"\n=== {old.get('commit')} -> {new.get('commit')} ===")
+    regressions = 0
+    for result in new['results']:
+        before = baseline.get((result['benchmark'], result['n']))
+        if not before:
+            continue
+        ratio = result['us_per_op'] / before
+        flag = "  <-- slower" if ratio >= threshold else ""
+        regressions += bool(flag)
+        print(f"n={result['n']:<8d} {result['benchmark']:32s} {before:10.3f} -> "
+              f"{result['us_per_op']:10.3f} us/op ({ratio:.2f}x){flag}")
+    return regressions
+
+
+class _DictPaymentNode:
+    """
+    PaymentNode without __slots__, for comparison: the same fields
+    (subtree totals included), each instance with its own __dict__.
+    """
+
+    def __init__(self, student_id, amount_paid, total_fee):
+        self.student_id = student_id
+        self.amount_paid = amount_paid
+        self.total_fee = total_fee
+        self.balance = total_fee - amount_paid
+        self.left = None
+        self.right = None
+        self.height = 1
+        self.subtree_size = 1
+        self.subtree_owed = self.balance if self.balance > 0 else 0
+        self.subtree_pending = 1 if self.balance > 0 else 0
+        self.subtree_max_balance = self.balance
+
+
+def _bytes_per_record(build, n):
+    """Average bytes allocated per record by build(), which must keep its result alive."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / n
+
+
+def bench_record_memory(n: int = 100000):
+    """Compare bytes per record for the old dict/class records and the slotted ones."""
+    print(f"\n=== RECORD MEMORY: {n} RECORDS ===")
+    ids = sequential_ids(n)
+    # Course IDs arrive as fresh strings (e.g. parsed from a file), not shared constants
+    courses = [f"C{i % 200:03d}" for i in range(n)]
+    names = [f"Student {sid}" for sid in ids]
+
+    def dict_students():
+        return [{'name': name, 'course_id': "".join(course)} for name, course in zip(names, courses)]
+
+    def slotted_students():
+        return [school.StudentRecord(name, "".join(course)) for name, course in zip(names, courses)]
+
+    def dict_payments():
+        return [_DictPaymentNode(sid, 500.0, 1000.0) for sid in ids]
+
+    def slotted_payments():
+        return [school.PaymentNode(sid, 500.0, 1000.0) for sid in ids]
+
+    nodes = slotted_payments()
+    fees = school.FeeTracking
+
+    def dict_records():
+        return [{'student_id': node.student_id, 'amount_paid': node.amount_paid,
+                 'total_fee': node.total_fee, 'balance': node.balance,
+                 'status': "Cleared" if node.balance <= 0 else "Pending"} for node in nodes]
+
+    def view_records():
+        return [fees._node_record(node) for node in nodes]
+
+    for label, before, after in (("student record", dict_students, slotted_students),
+                                 ("payment node", dict_payments, slotted_payments),
+                                 ("payment lookup result", dict_records, view_records)):
+        old = _bytes_per_record(before, n)
+        new = _bytes_per_record(after, n)
+        print(f"{label:21s}: before = {old:6.1f} B, after = {new:6.1f} B "
+              f"({100 * (1 - new / old):.0f}% smaller)")
+
+
+def _run_all():
+    bench_fee_tree_depth()
+    stress_concurrent_enrolment()
+    bench_waitlist()
+    bench_timetable()
+    bench_bulk_load()
+    bench_cold_start()
+    bench_ledger_replay()
+    check_exact_payment_updates()
+    bench_http_server()
+    bench_report_cards()
+    bench_metrics_overhead()
+    bench_record_memory()
+    run_suite()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command")
+    suite = commands.add_parser("suite", help="time the hot paths and optionally save JSON")
+    suite.add_argument("--sizes", default="1000,10000,100000",
+                       help="comma separated record counts (up to 1000000)")
+    suite.add_argument("--json", help="write the results to this file")
+    suite.add_argument("--sink", choices=("console", "null"), default="console",
+                       help="print messages to os.devnull (console) or drop them (null)")
+    compare = commands.add_parser("compare", help="compare two saved suite runs")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--threshold", type=float, default=1.2)
+    options = parser.parse_args()
+
+    if options.command == "suite":
+        run_suite([int(size) for size in options.sizes.split(",")], options.json, options.sink)
+    elif options.command == "compare":
+        sys.exit(1 if compare_results(options.old, options.new, options.threshold) else 0)
+    else:
+        _run_all()
@@ -1,6 +1,342 @@
+import asyncio
+import bisect
+import gc
 import heapq
-from typing import Dict, List, Tuple, Optional, Any
+import itertools
+import json
+import multiprocessing
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import urllib.parse
+from collections import Counter, deque
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, List, Tuple, Optional, Any, Iterator, TextIO, Iterable, Callable
 
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for ScoreMatrix
+    np = None
+
+
+def _fold(text: str) -> str:
+    """Lowercase text and strip accents so 'José' and 'jose' compare equal."""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def _to_json(value: Any):
+    """json.dumps default= hook: records are Mappings (not dicts) and some indexes hold sets."""
+    if isinstance(value, Mapping):
+        return dict(value)
+    if isinstance(value, (set, frozenset, deque)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class OutputSink:
+    """
+    Where the modules send their messages instead of calling print() directly.
+    
+    Each message is an event name, a str.format template and the fields that
+    fill it in. Turning that into text is left to the sink, so a sink that
+    doesn't need text never pays for formatting. Modules default to a
+    NullSink; SchoolManager gives them a ConsoleSink for the menus.
+    """
+    
+    # Reports skip building their rows altogether when this is False
+    enabled = True
+    
+    def emit(self, event: str, template: str, **fields):
+        raise NotImplementedError
+
+
+class NullSink(OutputSink):
+    """Drops every message. The default, for code that only uses return values."""
+    
+    enabled = False
+    
+    def emit(self, event: str, template: str, **fields):
+        pass
+
+
+class ConsoleSink(OutputSink):
+    """Prints each message, like the modules used to (to out, or stdout at the time)."""
+    
+    def __init__(self, out: Optional[TextIO] = None):
+        self.out = out
+        
+    def emit(self, event: str, template: str, **fields):
+        print(template.format(**fields), file=self.out or sys.stdout)
+
+
+class BufferedSink(OutputSink):
+    """
+    Keeps messages unformatted in memory (the most recent limit of them, if
+    given) until someone reads them back with lines() or events().
+    """
+    
+    def __init__(self, limit: Optional[int] = None):
+        self._messages = deque(maxlen=limit)
+        
+    def emit(self, event: str, template: str, **fields):
+        self._messages.append((event, template, fields))
+        
+    def events(self) -> List[Tuple[str, Dict]]:
+        """Every (event, fields) pair kept, oldest first."""
+        return [(event, fields) for event, _, fields in self._messages]
+        
+    def lines(self) -> Iterator[str]:
+        """The kept messages as text, formatted one at a time as they are read."""
+        for _, template, fields in self._messages:
+            yield template.format(**fields)
+            
+    def clear(self):
+        self._messages.clear()
+
+
+class LoggingSink(OutputSink):
+    """Sends messages to a logging.Logger, only formatting them if the level is enabled."""
+    
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("school")
+        self.level = level
+        
+    def emit(self, event: str, template: str, **fields):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, template.format(**fields), extra={'event': event})
+
+
+class JsonLinesSink(OutputSink):
+    """Writes each message's fields as one JSON object per line; templates are never used."""
+    
+    def __init__(self, out: TextIO):
+        self.out = out
+        
+    def emit(self, event: str, template: str, **fields):
+        self.out.write(json.dumps({'event': event, **fields}, default=_to_json) + "\n")
+
+
+class Report:
+    """
+    A titled list of rows that is only formatted when somebody reads it.
+    
+    rows is called again on every read, so a report always shows the data as
+    it is now. page(n) formats only the rows on page n; skipped rows are
+    stepped over without being formatted.
+    """
+    
+    def __init__(self, name: str, title: str, rows: Callable[[], Iterable],
+                 fields: Callable[[Any], Dict], template: str,
+                 empty_message: str, page_size: int = 50):
+        self.name = name
+        self.title = title
+        self.rows = rows
+        self.fields = fields
+        self.template = template
+        self.empty_message = empty_message
+        self.page_size = page_size
+        
+    def _row_fields(self, page: Optional[int] = None) -> Iterator[Dict]:
+        rows = iter(self.rows())
+        if page is not None:
+            rows = itertools.islice(rows, page * self.page_size, (page + 1) * self.page_size)
+        return map(self.fields, rows)
+        
+    def __iter__(self) -> Iterator[str]:
+        for fields in self._row_fields():
+            yield self.template.format(**fields)
+            
+    def page(self, number: int) -> List[str]:
+        """The formatted lines on one page (numbered from 0)."""
+        return [self.template.format(**fields) for fields in self._row_fields(number)]
+        
+    def pages(self) -> Iterator[List[str]]:
+        """Every page in turn, each formatted only when it is reached."""
+        lines = iter(self)
+        while True:
+            page = list(itertools.islice(lines, self.page_size))
+            if not page:
+                return
+            yield page
+            
+    def show(self, output: OutputSink, page: Optional[int] = None) -> int:
+        """Send the report (or one page of it) to a sink; returns how many rows went out."""
+        if not output.enabled:
+            return 0
+        count = 0
+        for fields in self._row_fields(page):
+            if count == 0:
+                output.emit(self.name + '_title', "\n=== {title} ===", title=self.title)
+            output.emit(self.name + '_row', self.template, **fields)
+            count += 1
+        if count == 0:
+            output.emit(self.name + '_empty', "{message}", message=self.empty_message)
+        return count
+        
+    def write(self, out: TextIO, page: Optional[int] = None) -> int:
+        """Write the report (or one page of it) as text to a stream; returns the row count."""
+        return self.show(ConsoleSink(out), page)
+
+
+class Metrics:
+    """
+    Call counts, error counts and latency histograms per module operation.
+    
+    Nothing here is on a hot path until wrap() is used: SchoolManager only
+    wraps the module methods while metrics are enabled, so a disabled system
+    runs the plain methods with no extra work at all.
+    """
+    
+    # Upper bounds (seconds) of the latency buckets; anything slower goes in +Inf
+    BUCKETS = (0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+               0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+    
+    def __init__(self, buckets: Optional[Iterable[float]] = None):
+        self.buckets = tuple(sorted(self.BUCKETS if buckets is None else buckets))
+        # (module, operation) -> [calls, errors, total seconds, count per bucket..., count over the last bound]
+        self.operations = {}
+        self._lock = threading.Lock()
+        
+    def _stats(self, module: str, operation: str) -> List:
+        with self._lock:
+            stats = self.operations.get((module, operation))
+            if stats is None:
+                stats = self.operations[(module, operation)] = [0, 0, 0.0] + [0] * (len(self.buckets) + 1)
+            return stats
+            
+    def observe(self, module: str, operation: str, seconds: float, failed: bool = False):
+        """Record one call that took the given number of seconds."""
+        stats = self._stats(module, operation)
+        bucket = 3 + bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            stats[0] += 1
+            stats[1] += failed
+            stats[2] += seconds
+            stats[bucket] += 1
+            
+    def wrap(self, module: str, method: Callable, operation: Optional[str] = None) -> Callable:
+        """A stand-in for method that times every call (and counts the ones that raise)."""
+        operation = operation or method.__name__
+        # Looked up once here, so a call only pays for the clock, a bisect and the lock
+        stats = self._stats(module, operation)
+        buckets = self.buckets
+        lock = self._lock
+        clock = time.perf_counter
+        
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                result = method(*args, **kwargs)
+            except BaseException:
+                self.observe(module, operation, clock() - start, True)
+                raise
+            seconds = clock() - start
+            bucket = 3 + bisect.bisect_left(buckets, seconds)
+            with lock:
+                stats[0] += 1
+                stats[2] += seconds
+                stats[bucket] += 1
+            return result
+            
+        timed.__name__ = operation
+        timed.__doc__ = method.__doc__
+        timed.__wrapped__ = method
+        return timed
+        
+    def reset(self):
+        """Zero every count; methods already wrapped keep recording into the same stats."""
+        with self._lock:
+            for stats in self.operations.values():
+                stats[:] = [0, 0, 0.0] + [0] * (len(self.buckets) + 1)
+            
+    def snapshot(self) -> Dict[str, Dict[str, Dict]]:
+        """
+        {module: {operation: stats}}, where stats has the call and error
+        counts, total and mean seconds, and the cumulative bucket counts
+        keyed by upper bound ('+Inf' last), the way Prometheus reports them.
+        """
+        bounds = [format(bound, 'g') for bound in self.buckets] + ['+Inf']
+        with self._lock:
+            operations = sorted((key, list(stats)) for key, stats in self.operations.items() if stats[0])
+        snapshot = {}
+        for (module, operation), stats in operations:
+            calls, errors, total = stats[:3]
+            snapshot.setdefault(module, {})[operation] = {
+                'calls': calls,
+                'errors': errors,
+                'total_seconds': total,
+                'mean_seconds': total / calls,
+                'buckets': dict(zip(bounds, itertools.accumulate(stats[3:]))),
+            }
+        return snapshot
+
+
+class StudentRecord(Mapping):
+    """
+    One student's details, stored in fixed slots instead of a per-student dict.
+    
+    It reads like the dict it replaces (record['name'], .get, .items, ==
+    against a dict) but costs a fraction of the memory. Course IDs are
+    interned, so thousands of students in CS101 share a single string.
+    Fields other than name and course_id go in a small overflow dict that
+    is only created when needed.
+    
+    Records are read-only to callers: search_student hands out the live
+    record, and a change made to it directly would bypass the registry's
+    indexes and journal. Changes go through update_student_info.
+    """
+    
+    __slots__ = ('_name', '_course_id', '_extra')
+    _FIELDS = ('name', 'course_id')
+    
+    def __init__(self, name: str, course_id: str):
+        self._name = name
+        self._course_id = sys.intern(course_id) if type(course_id) is str else course_id
+        self._extra = None
+        
+    def __getitem__(self, key: str):
+        if key == 'name':
+            return self._name
+        if key == 'course_id':
+            return self._course_id
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+        
+
+    def __iter__(self):
+        yield from self._FIELDS
+        if self._extra:
+            yield from self._extra
+            
+    def __len__(self) -> int:
+        return 2 + (len(self._extra) if self._extra else 0)
+        
+    def _apply(self, changes: Dict):
+        """Overwrite fields; only StudentRegistry calls this, with the indexes in hand."""
+        for key, value in changes.items():
+            if key == 'course_id':
+                self._course_id = sys.intern(value) if type(value) is str else value
+            elif key == 'name':
+                self._name = value
+            else:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[key] = value
+            
+    def __repr__(self) -> str:
+        return repr(dict(self))
+        
+        
 class StudentRegistry:
     """
     Manages student records using a fast lookup dictionary.
@@ -8,58 +344,198 @@ class StudentRegistry:
     This module handles all student information with quick access times.
     We use a dictionary as our main storage since it provides instant access
     to student records by their ID.
+    
+    Two secondary indexes are kept next to the main dictionary: students per
+    course, and a sorted list of normalized names so a name prefix maps to one
+    contiguous range. Every change to a student updates both.
     """
     
-    def __init__(self):
+    def __init__(self, output: Optional[OutputSink] = None):
+        # Messages go here; by default they are dropped without being formatted
+        self.output = output or NullSink()
         # Stores students by their ID for quick access
         self.students = {}
+        # course_id -> dict of student IDs (used as an ordered set)
+        self.by_course = {}
+        # (normalized name, student_id) pairs in sorted order
+        self._name_keys = []
+        # Called as journal(operation, *args) after every change, e.g. by SchoolStore
+        self.journal = None
         
     def register_student(self, student_id: str, name: str, course_id: str) -> bool:
         """Add a new student to the system."""
+        if not self._add(student_id, name, course_id):
+            self.output.emit('duplicate_student', "Error: Student ID {student_id} already exists!",
+                             student_id=student_id)
+            return False
+        self.output.emit('student_registered',
+                         "Student {name} (ID: {student_id}) registered successfully!",
+                         student_id=student_id, name=name, course_id=course_id)
+        return True
+        
+    def _add(self, student_id: str, name: str, course_id: str) -> bool:
+        """Register a student without printing; False if the ID is taken."""
         if student_id in self.students:
-            print(f"Error: Student ID {student_id} already exists!")
             return False
-        self.students[student_id] = {
-            'name': name,
-            'course_id': course_id
-        }
-        print(f"Student {name} (ID: {student_id}) registered successfully!")
+        # Indexed by course, so refuse an unhashable one before anything is stored
+        hash(course_id)
+        self.students[student_id] = StudentRecord(name, course_id)
+        self._index(student_id, self.students[student_id])
+        if self.journal:
+            self.journal('save_student', student_id, name, course_id, None)
         return True
         
+    def bulk_load(self, records: Iterable[Tuple[str, str, str]]) -> Dict[str, int]:
+        """
+        Register many (student_id, name, course_id) records without printing each one.
+        
+        Records with a blank student ID are rejected; IDs that are already
+        registered (or repeated in the batch) count as duplicates.
+        Returns how many records were inserted, duplicated and rejected.
+        """
+        summary = {'inserted': 0, 'duplicates': 0, 'rejected': 0}
+        students = self.students
+        new_name_keys = []
+        try:
+            for student_id, name, course_id in records:
+                if not student_id:
+                    summary['rejected'] += 1
+                elif student_id in students:
+                    summary['duplicates'] += 1
+                else:
+                    # Same check as _add: nothing is stored for an unindexable course
+                    hash(course_id)
+                    students[student_id] = StudentRecord(name, course_id)
+                    self.by_course.setdefault(course_id, {})[student_id] = None
+                    new_name_keys.append((_fold(name), student_id))
+                    if self.journal:
+                        self.journal('save_student', student_id, name, course_id, None)
+                    summary['inserted'] += 1
+        finally:
+            # One sort for the whole batch instead of an insort per student;
+            # done even if a bad row stops the batch part-way
+            if new_name_keys:
+                self._name_keys.extend(new_name_keys)
+                self._name_keys.sort()
+        return summary
+        
+    def _index(self, student_id: str, info: Dict):
+        self.by_course.setdefault(info.get('course_id'), {})[student_id] = None
+        bisect.insort(self._name_keys, (_fold(info.get('name', '')), student_id))
+        
+    def _unindex(self, student_id: str, info: Dict):
+        course_id = info.get('course_id')
+        members = self.by_course.get(course_id)
+        if members is not None:
+            members.pop(student_id, None)
+            if not members:
+                del self.by_course[course_id]
+        key = (_fold(info.get('name', '')), student_id)
+        i = bisect.bisect_left(self._name_keys, key)
+        if i < len(self._name_keys) and self._name_keys[i] == key:
+            del self._name_keys[i]
+            
+    def students_in_course(self, course_id: str) -> Iterator[Tuple[str, Dict]]:
+        """Yield (student_id, info) for every student registered to a course."""
+        for student_id in self.by_course.get(course_id, {}):
+            yield student_id, self.students[student_id]
+            
+    def students_by_name_prefix(self, prefix: str) -> Iterator[Tuple[str, Dict]]:
+        """
+        Yield (student_id, info) for students whose name starts with prefix,
+        ignoring case and accents, in name order.
+        """
+        prefix = _fold(prefix)
+        keys = self._name_keys
+        i = bisect.bisect_left(keys, (prefix,))
+        while i < len(keys) and keys[i][0].startswith(prefix):
+            student_id = keys[i][1]
+            yield student_id, self.students[student_id]
+            i += 1
+        
     def search_student(self, student_id: str) -> Optional[Dict]:
         """Find a student by their ID."""
         if student_id in self.students:
             return self.students[student_id]
-        print("Record Not Found.")
+        self.output.emit('student_not_found', "Record Not Found.", student_id=student_id)
         return None
         
     def update_student_info(self, student_id: str, new_data: Dict) -> bool:
         """Update information for an existing student."""
-        if student_id not in self.students:
-            print("Student not found!")
+        if self._update(student_id, new_data) is None:
+            self.output.emit('student_not_found', "Student not found!", student_id=student_id)
             return False
-        self.students[student_id].update(new_data)
-        print(f"Student {student_id} updated successfully!")
+        self.output.emit('student_updated', "Student {student_id} updated successfully!",
+                         student_id=student_id)
         return True
         
+    def _update(self, student_id: str, new_data: Dict) -> Optional[StudentRecord]:
+        """
+        Change a student's details without printing; returns the updated record.
+        
+        new_data is checked before anything is touched (TypeError or
+        ValueError if it isn't a mapping, its course_id can't be indexed or
+        a field other than name and course_id couldn't be saved as JSON), so
+        a bad update leaves the record and both indexes as they were.
+        """
+        info = self.students.get(student_id)
+        if info is None:
+            return None
+        new_data = dict(new_data)
+        hash(new_data.get('course_id'))
+        extra = {key: value for key, value in new_data.items() if key not in StudentRecord._FIELDS}
+        if extra:
+            if not all(isinstance(key, str) for key in extra):
+                raise TypeError("student field names must be strings")
+            json.dumps(extra, default=_to_json)
+        self._unindex(student_id, info)
+        info._apply(new_data)
+        self._index(student_id, info)
+        if self.journal:
+            self.journal('save_student', student_id, info.get('name'), info.get('course_id'),
+                         info._extra)
+        return info
+        
+    def _remove(self, student_id: str) -> Optional[StudentRecord]:
+        """Take a student out of the registry and its indexes, without printing."""
+        record = self.students.pop(student_id, None)
+        if record is None:
+            return None
+        self._unindex(student_id, record)
+        if self.journal:
+            self.journal('delete_student', student_id)
+        return record
+        
+    def _restore(self, student_id: str, record: StudentRecord):
+        """Put back a student removed by _remove."""
+        self.students[student_id] = record
+        self._index(student_id, record)
+        if self.journal:
+            self.journal('save_student', student_id, record.get('name'), record.get('course_id'),
+                         record._extra)
+            
     def delete_student(self, student_id: str) -> bool:
         """Remove a student from the system."""
-        if student_id not in self.students:
-            print("Student not found!")
+        if self._remove(student_id) is None:
+            self.output.emit('student_not_found', "Student not found!", student_id=student_id)
             return False
-        del self.students[student_id]
-        print(f"Student {student_id} deleted successfully!")
+        self.output.emit('student_deleted', "Student {student_id} deleted successfully!",
+                         student_id=student_id)
         return True
         
-    def display_all_students(self):
-        """Show all registered students."""
-        if not self.students:
-            print("No students registered.")
-            return
-            
-        print("\n=== ALL STUDENTS ===")
-        for student_id, info in self.students.items():
-            print(f"ID: {student_id}, Name: {info['name']}, Course: {info['course_id']}")
+    def students_report(self, page_size: int = 50) -> Report:
+        """Every registered student, in registration order, formatted on demand."""
+        return Report('all_students', "ALL STUDENTS", self.students.items,
+                      lambda item: {'student_id': item[0], 'name': item[1]['name'],
+                                    'course_id': item[1]['course_id']},
+                      "ID: {student_id}, Name: {name}, Course: {course_id}",
+                      "No students registered.", page_size)
+                      
+    def display_all_students(self, page: Optional[int] = None, page_size: int = 50) -> Report:
+        """Show all registered students (or just one page of them)."""
+        report = self.students_report(page_size)
+        report.show(self.output, page)
+        return report
 
 
 class CourseScheduler:
@@ -68,60 +544,658 @@ class CourseScheduler:
     
     Students are processed in the order they register, just like waiting in line.
     Each course has limited spots, so we process requests until courses fill up.
+    
+    The line is a deque, so taking the next request is O(1) even when a burst
+    of requests arrives at once. Like the circular queue in
+    modules in c++/CourseScheduling_CircularQueue.cpp it can be given a fixed
+    size (max_pending), in which case new requests are turned away while it is full.
+    
+    Seats are reserved under a per-course lock, so several worker threads can
+    drain the queue at once without ever putting more students in a course
+    than it can hold.
+    
+    A request for a full course isn't thrown away: the student joins that
+    course's waitlist, a heap ordered by seniority (higher first) and then by
+    arrival. When a seat frees up, or the course grows, the top of the
+    waitlist is enrolled straight away in O(log n). Leaving a waitlist just
+    marks the entry stale; stale entries are skipped when they reach the top.
+    
+    Courses can be given weekly meeting times (load_course_meetings). The
+    week is cut into SLOT_MINUTES slots and each course's meetings become a
+    bitmask with one bit per slot; each student keeps the OR of their
+    courses' masks. A new course clashes exactly when its mask and the
+    student's share a bit, so the check is one AND no matter how many courses
+    the school runs.
     """
     
-    def __init__(self):
+    # Used until course capacities are loaded from data (load_course_capacity)
+    DEFAULT_COURSE_CAPACITY = {'CS101': 2, 'MATH201': 2, 'PHY301': 1}
+    # Timetable resolution. One-minute slots make every mask exact, so
+    # back-to-back meetings (09:00-09:50, 09:50-10:40) never share a bit
+    SLOT_MINUTES = 1
+    DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+    
+    def __init__(self, max_pending: Optional[int] = None,
+                 course_capacity: Optional[Dict[str, int]] = None,
+                 output: Optional[OutputSink] = None):
+        # Messages go here; by default they are dropped without being formatted
+        self.output = output or NullSink()
         # Students wait in line for course registration
-        self.registration_queue = []
-        # Tracks which students got into which courses
+        self.registration_queue = deque()
+        # None means the line can grow without limit
+        self.max_pending = max_pending
+        # Tracks which students got into which courses. Each course maps to a
+        # dict used as an ordered set, so membership checks and seat counts
+        # are O(1) while enrolment order is kept for display.
         self.course_allocations = {}
+        # Reverse index: which courses each student got into
+        self.student_courses = {}
+        # Called as journal(operation, *args) after every change, e.g. by SchoolStore
+        self.journal = None
         # How many students each course can hold
-        self.course_capacity = {'CS101': 2, 'MATH201': 2, 'PHY301': 1}
+        self.course_capacity = dict(self.DEFAULT_COURSE_CAPACITY if course_capacity is None
+                                    else course_capacity)
+        # course_id -> heap of (-seniority, arrival, student_id) for students
+        # waiting for a seat, and course_id -> {student_id: arrival} for the
+        # entries that are still live
+        self.waitlists = {}
+        self._waitlisted = {}
+        # Reverse index: which waitlists each student is on
+        self.student_waitlists = {}
+        # student_id -> seniority (e.g. year of study); students not listed count as 0
+        self.seniority = {}
+        self._arrivals = itertools.count()
+        # course_id -> [(day, start_minute, end_minute)] and the same as a slot bitmask
+        self.course_meetings = {}
+        self.course_slots = {}
+        # student_id -> OR of the slot masks of every course they hold
+        self.student_busy = {}
+        # Students (as an ordered set) holding two courses that meet at the
+        # same time, kept current as seats and meeting times change
+        self._clashing = {}
+        # Locks for running the queue from several threads: one for the line
+        # itself, one per course for seat checks, and one for the reverse index
+        self._queue_lock = threading.Lock()
+        self._course_locks = {}
+        self._course_locks_guard = threading.Lock()
+        self._index_lock = threading.Lock()
         
-    def enrol_student_request(self, student_id: str, course_id: str):
+    def enrol_student_request(self, student_id: str, course_id: str) -> bool:
         """Add a student to the waiting list for a course."""
-        self.registration_queue.append((student_id, course_id))
-        print(f"Registration request queued: Student {student_id} for {course_id}")
+        if not self._enqueue(student_id, course_id):
+            self.output.emit('queue_full',
+                             "Registration queue full, try again later: "
+                             "Student {student_id} for {course_id}",
+                             student_id=student_id, course_id=course_id)
+            return False
+        self.output.emit('request_queued',
+                         "Registration request queued: Student {student_id} for {course_id}",
+                         student_id=student_id, course_id=course_id)
+        return True
         
-    def process_queue(self):
-        """Process all waiting registration requests."""
-        if not self.registration_queue:
-            print("No pending registration requests.")
-            return
-            
-        print("\n=== PROCESSING REGISTRATION QUEUE ===")
-        while self.registration_queue:
-            student_id, course_id = self.registration_queue.pop(0)  # Take next in line
+    def _enqueue(self, student_id: str, course_id: str) -> bool:
+        """Join the line without printing; False if the line is full."""
+        with self._queue_lock:
+            if self.max_pending is not None and len(self.registration_queue) >= self.max_pending:
+                return False
+            self.registration_queue.append((student_id, course_id))
+        return True
+        
+    def _course_lock(self, course_id: str) -> threading.Lock:
+        """Get (or create) the lock guarding a course's seats."""
+        lock = self._course_locks.get(course_id)
+        if lock is None:
+            with self._course_locks_guard:
+                lock = self._course_locks.setdefault(course_id, threading.Lock())
+        return lock
+        
+    def _next_request(self) -> Optional[Tuple[str, str]]:
+        """Take the next request off the line, or None if it is empty."""
+        with self._queue_lock:
+            if self.registration_queue:
+                return self.registration_queue.popleft()
+        return None
+        
+    def _try_enrol(self, student_id: str, course_id: str, waitlist: bool = True,
+                   check_times: bool = True, check_capacity: bool = True) -> str:
+        """
+        Try to give one student a seat in a course, without printing.
+        
+        If the course is full the student joins its waitlist, unless waitlist
+        is False. A course that meets at the same time as one the student
+        already has is refused, unless check_times is False. With
+        check_capacity=False the seat is given even if the course is full
+        (for seats that were already held). Returns 'enrolled', 'waitlisted', 'duplicate',
+        'conflict', 'full' or 'unknown_course'.
+        """
+        if course_id not in self.course_capacity:
+            return 'unknown_course'
+        slots = self.course_slots.get(course_id, 0)
             
-            if course_id not in self.course_capacity:
-                print(f"Course {course_id} not found for student {student_id}")
-                continue
-                
+        # Checking for room and taking the seat happen under the same lock
+        with self._course_lock(course_id):
             # Set up tracking for new courses
             if course_id not in self.course_allocations:
-                self.course_allocations[course_id] = []
+                self.course_allocations[course_id] = {}
+            enrolled = self.course_allocations[course_id]
+            
+            # Don't let the same student take up two seats
+            if student_id in enrolled:
+                return 'duplicate'
                 
             # Check if there's still room in the course
-            if len(self.course_allocations[course_id]) < self.course_capacity[course_id]:
-                self.course_allocations[course_id].append(student_id)
-                print(f"✓ Student {student_id} enrolled in {course_id}")
+            if check_capacity and len(enrolled) >= self.course_capacity[course_id]:
+                if check_times and self.student_busy.get(student_id, 0) & slots:
+                    return 'conflict'
+                if not waitlist:
+                    return 'full'
+                entry = self._join_waitlist(student_id, course_id)
+                if entry is None:  # already waiting for this course
+                    return 'waitlisted'
             else:
-                print(f"✗ Course Full: {course_id} for student {student_id}")
+                # The clash check and booking the time happen together, so two
+                # courses at the same hour can't both get through at once
+                with self._index_lock:
+                    if not self._book_time(student_id, course_id, slots, check_times):
+                        return 'conflict'
+                enrolled[student_id] = None
+                entry = None
                 
-    def display_course_allocations(self):
-        """Show which students are enrolled in each course."""
-        if not self.course_allocations:
-            print("No course allocations yet.")
+        if entry is not None:
+            with self._index_lock:
+                self.student_waitlists.setdefault(student_id, set()).add(course_id)
+            if self.journal:
+                self.journal('waitlist', course_id, student_id, *entry)
+            return 'waitlisted'
+            
+        if self.journal:
+            self.journal('enrol', course_id, student_id)
+        return 'enrolled'
+        
+    def _book_time(self, student_id: str, course_id: str, slots: int,
+                   check_times: bool = True) -> bool:
+        """
+        Add a course to a student's courses and timetable unless it clashes
+        with what they already have; the caller holds _index_lock.
+        """
+        busy = self.student_busy.get(student_id, 0)
+        if busy & slots:
+            if check_times:
+                return False
+            self._clashing[student_id] = None
+        if slots:
+            self.student_busy[student_id] = busy | slots
+        self.student_courses.setdefault(student_id, set()).add(course_id)
+        return True
+        
+    def _join_waitlist(self, student_id: str, course_id: str,
+                       seniority: Optional[int] = None,
+                       arrival: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """
+        Push a student onto a course's waitlist; the course lock must be held.
+        
+        Returns the (seniority, arrival) the entry was filed under, or None if
+        the student was already waiting.
+        """
+        live = self._waitlisted.setdefault(course_id, {})
+        if student_id in live:
+            return None
+        if seniority is None:
+            seniority = self.seniority.get(student_id, 0)
+        if arrival is None:
+            arrival = next(self._arrivals)
+        heapq.heappush(self.waitlists.setdefault(course_id, []), (-seniority, arrival, student_id))
+        live[student_id] = arrival
+        return seniority, arrival
+        
+    def _promote(self, course_id: str) -> Tuple[List[str], List[str]]:
+        """
+        Fill any free seats in a course from the top of its waitlist; the
+        course lock must be held. Students whose timetable now clashes with
+        the course are taken off the waitlist instead. Returns the students
+        who got a seat and the ones who were passed over.
+        """
+        heap = self.waitlists.get(course_id)
+        if not heap:
+            return [], []
+        live = self._waitlisted[course_id]
+        enrolled = self.course_allocations.setdefault(course_id, {})
+        slots = self.course_slots.get(course_id, 0)
+        promoted, passed_over = [], []
+        with self._index_lock:
+            while heap and len(enrolled) < self.course_capacity[course_id]:
+                _, arrival, student_id = heapq.heappop(heap)
+                # Entries of students who left the waitlist are skipped here
+                if live.get(student_id) != arrival:
+                    continue
+                del live[student_id]
+                self._forget_waitlist(student_id, course_id)
+                if self._book_time(student_id, course_id, slots):
+                    enrolled[student_id] = None
+                    promoted.append(student_id)
+                else:
+                    passed_over.append(student_id)
+        return promoted, passed_over
+        
+    def _record_promotions(self, course_id: str, promoted: List[str], passed_over: List[str]):
+        """Journal and report what _promote did."""
+        for student_id in passed_over:
+            if self.journal:
+                self.journal('unwaitlist', course_id, student_id)
+            self.output.emit('passed_over',
+                             "Student {student_id} taken off the {course_id} waitlist "
+                             "(timetable clash)", student_id=student_id, course_id=course_id)
+        for student_id in promoted:
+            if self.journal:
+                self.journal('unwaitlist', course_id, student_id)
+                self.journal('enrol', course_id, student_id)
+            self.output.emit('promoted',
+                             "↑ Seat freed: Student {student_id} moved from the waitlist "
+                             "into {course_id}", student_id=student_id, course_id=course_id)
+                             
+    def _forget_waitlist(self, student_id: str, course_id: str):
+        # Caller holds _index_lock
+        waiting = self.student_waitlists.get(student_id)
+        if waiting is not None:
+            waiting.discard(course_id)
+            if not waiting:
+                del self.student_waitlists[student_id]
+                
+    def _leave_waitlist(self, student_id: str, course_id: str) -> bool:
+        """Take a student off a course's waitlist, without printing."""
+        with self._course_lock(course_id):
+            live = self._waitlisted.get(course_id)
+            if not live or live.pop(student_id, None) is None:
+                return False
+            # Rebuild the heap once stale entries make up most of it
+            heap = self.waitlists[course_id]
+            if len(heap) > 2 * len(live) + 16:
+                heap[:] = [entry for entry in heap if live.get(entry[2]) == entry[1]]
+                heapq.heapify(heap)
+        with self._index_lock:
+            self._forget_waitlist(student_id, course_id)
+        if self.journal:
+            self.journal('unwaitlist', course_id, student_id)
+        return True
+        
+    def load_course_capacity(self, capacities) -> int:
+        """
+        Set course capacities from data: a dict or (course_id, capacity) pairs,
+        e.g. rows read from a CSV file or a database.
+        
+        Courses not mentioned keep their current capacity. A course that grows
+        fills its new seats from its waitlist right away; one that shrinks
+        keeps the students it already has. Returns how many courses were set.
+        """
+        if isinstance(capacities, Mapping):
+            capacities = capacities.items()
+        count = 0
+        for course_id, capacity in capacities:
+            with self._course_lock(course_id):
+                self.course_capacity[course_id] = int(capacity)
+                promoted, passed_over = self._promote(course_id)
+            self._record_promotions(course_id, promoted, passed_over)
+            count += 1
+        return count
+        
+    @classmethod
+    def _minute_of_day(cls, value) -> int:
+        """Accept 'HH:MM' or minutes since midnight."""
+        if isinstance(value, str):
+            hours, _, minutes = value.partition(':')
+            return int(hours) * 60 + int(minutes or 0)
+        return int(value)
+        
+    @classmethod
+    def _meeting_slots(cls, day, start, end) -> Tuple[Tuple[int, int, int], int]:
+        """Normalize one meeting and turn it into its slot bitmask."""
+        if isinstance(day, str):
+            day = cls.DAYS.index(day[:3].lower())
+        day, start, end = int(day), cls._minute_of_day(start), cls._minute_of_day(end)
+        if not 0 <= day < 7 or not 0 <= start < end <= 24 * 60:
+            raise ValueError(f"bad meeting time: day {day}, {start}-{end} minutes")
+        slots_per_day = 24 * 60 // cls.SLOT_MINUTES
+        first = day * slots_per_day + start // cls.SLOT_MINUTES
+        last = day * slots_per_day + -(-end // cls.SLOT_MINUTES)  # round up
+        return (day, start, end), ((1 << (last - first)) - 1) << first
+        
+    def load_course_meetings(self, meetings: Iterable[Tuple[str, Any, Any, Any]]) -> int:
+        """
+        Set weekly meeting times from (course_id, day, start, end) rows.
+        
+        day is 0-6 or a name ('Mon', 'tuesday'); start and end are 'HH:MM' or
+        minutes since midnight. Each course mentioned gets exactly the
+        meetings listed for it, replacing what it had. Students already
+        enrolled keep their seats (find_conflicts reports any clashes that
+        causes). Returns how many courses were set.
+        """
+        new_meetings, new_slots = {}, {}
+        for course_id, day, start, end in meetings:
+            meeting, slots = self._meeting_slots(day, start, end)
+            new_meetings.setdefault(course_id, []).append(meeting)
+            new_slots[course_id] = new_slots.get(course_id, 0) | slots
+        with self._index_lock:
+            self.course_meetings.update(new_meetings)
+            self.course_slots.update(new_slots)
+            for course_id in new_slots:
+                for student_id in self.course_allocations.get(course_id, ()):
+                    self._refresh_busy(student_id)
+        return len(new_slots)
+        
+    def find_conflicts(self) -> Iterator[Tuple[str, str, str]]:
+        """
+        Yield (student_id, course_a, course_b) for every pair of courses a
+        student holds that meet at the same time.
+        
+        Which students have a clash is kept up to date as seats and meeting
+        times change (a new course's mask overlapping the student's busy
+        mask, or _refresh_busy finding an overlap), so only those students
+        have their own few courses compared pairwise. The cost follows the
+        number of clashing students, not the size of the school, which keeps
+        GET /timetable-conflicts cheap enough for the server's event loop.
+        """
+        slots = self.course_slots
+        with self._index_lock:
+            clashing = list(self._clashing)
+        # Each student's courses are read as they are reached, so a caller
+        # that stops after a few clashes pays for only those
+        for student_id in clashing:
+            with self._index_lock:
+                courses = sorted(self.student_courses.get(student_id, ()))
+            masks = [slots.get(course_id, 0) for course_id in courses]
+            for i, (course_a, mask_a) in enumerate(zip(courses, masks)):
+                for course_b, mask_b in zip(courses[i + 1:], masks[i + 1:]):
+                    if mask_a & mask_b:
+                        yield student_id, course_a, course_b
+                        
+    def conflicts_report(self, page_size: int = 50) -> Report:
+        """Every timetable clash from find_conflicts, formatted on demand."""
+        return Report('timetable_conflicts', "TIMETABLE CONFLICTS", self.find_conflicts,
+                      lambda row: dict(zip(('student_id', 'course_a', 'course_b'), row)),
+                      "Student {student_id}: {course_a} clashes with {course_b}",
+                      "No timetable conflicts.", page_size)
+                      
+    def display_conflicts(self, page: Optional[int] = None, page_size: int = 50) -> Report:
+        """Show every student whose courses meet at the same time."""
+        report = self.conflicts_report(page_size)
+        report.show(self.output, page)
+        return report
+        
+    def waitlist_for(self, course_id: str) -> List[str]:
+        """Students waiting for a seat in a course, next in line first."""
+        with self._course_lock(course_id):
+            live = self._waitlisted.get(course_id, {})
+            return [student_id for _, arrival, student_id in sorted(self.waitlists.get(course_id, ()))
+                    if live.get(student_id) == arrival]
+                    
+    def waitlist_entries(self, student_id: str) -> List[Dict]:
+        """The waitlists a student is on, each with the seniority and arrival it was filed under."""
+        entries = []
+        for course_id in sorted(self.student_waitlists.get(student_id, ())):
+            with self._course_lock(course_id):
+                arrival = self._waitlisted.get(course_id, {}).get(student_id)
+                if arrival is None:
+                    continue
+                for neg_seniority, entry_arrival, entry_student in self.waitlists[course_id]:
+                    if entry_arrival == arrival and entry_student == student_id:
+                        entries.append({'course_id': course_id, 'seniority': -neg_seniority,
+                                        'arrival': arrival})
+                        break
+        return entries
+        
+    def _rejoin_waitlist(self, student_id: str, course_id: str, seniority: int, arrival: int) -> bool:
+        """Put a student back on a waitlist exactly where they were (e.g. to undo a removal)."""
+        with self._course_lock(course_id):
+            live = self._waitlisted.setdefault(course_id, {})
+            if student_id in live:
+                return False
+            if (-seniority, arrival, student_id) in self.waitlists.get(course_id, ()):
+                # The old entry was only dropped lazily and is still in the heap; revive it
+                live[student_id] = arrival
+            else:
+                self._join_waitlist(student_id, course_id, seniority, arrival)
+        with self._index_lock:
+            self.student_waitlists.setdefault(student_id, set()).add(course_id)
+        if self.journal:
+            self.journal('waitlist', course_id, student_id, seniority, arrival)
+        return True
+        
+    def _load_waitlist(self, entries: Iterable[Tuple[str, str, int, int]]):
+        """Restore saved (course_id, student_id, seniority, arrival) waitlist entries."""
+        last_arrival = -1
+        for course_id, student_id, seniority, arrival in entries:
+            with self._course_lock(course_id):
+                self._join_waitlist(student_id, course_id, seniority, arrival)
+            self.student_waitlists.setdefault(student_id, set()).add(course_id)
+            last_arrival = max(last_arrival, arrival)
+        # New entries must queue up behind the restored ones
+        self._arrivals = itertools.count(max(last_arrival + 1, next(self._arrivals)))
+        
+    # What process_queue reports for each _try_enrol outcome
+    _OUTCOME_MESSAGES = {
+        'enrolled': "✓ Student {student_id} enrolled in {course_id}",
+        'unknown_course': "Course {course_id} not found for student {student_id}",
+        'duplicate': "✗ Already Enrolled: Student {student_id} in {course_id}",
+        'full': "✗ Course Full: {course_id} for student {student_id}",
+        'waitlisted': "✗ Course Full: {course_id} for student {student_id} (added to waitlist)",
+        'conflict': "✗ Timetable Clash: {course_id} meets at the same time as another "
+                    "course of student {student_id}",
+    }
+    
+    def _process_request(self, student_id: str, course_id: str) -> bool:
+        """Try to give one student a seat in a course."""
+        outcome = self._try_enrol(student_id, course_id)
+        self.output.emit(outcome, self._OUTCOME_MESSAGES[outcome],
+                         student_id=student_id, course_id=course_id)
+        return outcome == 'enrolled'
+        
+    def bulk_load(self, enrolments: Iterable[Tuple[str, str]],
+                  check_capacity: bool = True) -> Dict[str, int]:
+        """
+        Enrol many (student_id, course_id) pairs directly, without printing each one.
+        
+        Pairs go straight to seat allocation in the order given, skipping the
+        registration queue. Students already in the course count as
+        duplicates; unknown or full courses are rejected. Timetable clashes
+        are not checked, so saved enrolments always load back even if course
+        times have changed since (find_conflicts will list them). With
+        check_capacity=False full courses take them too, so seats kept by a
+        course that later shrank load back as well. Returns how many
+        enrolments were inserted, duplicated and rejected.
+        """
+        summary = {'inserted': 0, 'duplicates': 0, 'rejected': 0}
+        for student_id, course_id in enrolments:
+            outcome = self._try_enrol(student_id, course_id, waitlist=False, check_times=False,
+                                      check_capacity=check_capacity)
+            if outcome == 'enrolled':
+                summary['inserted'] += 1
+            elif outcome == 'duplicate':
+                summary['duplicates'] += 1
+            else:
+                summary['rejected'] += 1
+        return summary
+        
+    def process_queue(self):
+        """Process all waiting registration requests."""
+        if not self.registration_queue:
+            self.output.emit('queue_empty', "No pending registration requests.")
             return
             
-        print("\n=== COURSE ALLOCATIONS ===")
-        for course_id, students in self.course_allocations.items():
-            print(f"{course_id}: {students}")
+        self.output.emit('processing_queue', "\n=== PROCESSING REGISTRATION QUEUE ===")
+        while True:
+            request = self._next_request()  # Take next in line
+            if request is None:
+                break
+            self._process_request(*request)
+            
+    def process_batch(self, n: int) -> int:
+        """
+        Process at most n waiting requests, oldest first.
+        
+        Lets a worker drain a big queue a chunk at a time. Returns how many
+        requests were taken off the queue. Safe to call from several threads,
+        though only process_queue_concurrent guarantees first-come,
+        first-served order inside each course.
+        """
+        processed = 0
+        while processed < n:
+            request = self._next_request()
+            if request is None:
+                break
+            self._process_request(*request)
+            processed += 1
+        return processed
+        
+    def process_queue_concurrent(self, workers: int = 8) -> int:
+        """
+        Process all waiting requests using a pool of worker threads.
+        
+        The line is split by course, keeping arrival order inside each course,
+        and each course's requests are handled by one worker at a time. That
+        keeps first-come, first-served fairness per course while different
+        courses fill up in parallel. Returns how many requests were processed.
+        """
+        by_course = {}
+        processed = 0
+        while True:
+            request = self._next_request()
+            if request is None:
+                break
+            student_id, course_id = request
+            by_course.setdefault(course_id, []).append(student_id)
+            processed += 1
+            
+        if not by_course:
+            self.output.emit('queue_empty', "No pending registration requests.")
+            return 0
+            
+        def drain(course_id: str, student_ids: List[str]):
+            for student_id in student_ids:
+                self._process_request(student_id, course_id)
+                
+        self.output.emit('processing_queue',
+                         "\n=== PROCESSING REGISTRATION QUEUE ({workers} WORKERS) ===",
+                         workers=workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(drain, course_id, student_ids)
+                       for course_id, student_ids in by_course.items()]
+            for future in futures:
+                future.result()
+        return processed
+        
+    def is_enrolled(self, student_id: str, course_id: str) -> bool:
+        """Check whether a student already holds a seat in a course."""
+        return student_id in self.course_allocations.get(course_id, ())
+        
+    def seats_taken(self, course_id: str) -> int:
+        """How many seats in a course are filled."""
+        return len(self.course_allocations.get(course_id, ()))
+        
+    def courses_for_student(self, student_id: str) -> List[str]:
+        """List the courses a student is enrolled in."""
+        return sorted(self.student_courses.get(student_id, ()))
+        
+    def _drop(self, student_id: str, course_id: str, promote: bool = True) -> bool:
+        """
+        Free a student's seat in one course. The seat goes to the next
+        student on the waitlist (reported as a 'promoted' message), unless
+        promote is False; then it stays free until _fill_seats is called.
+        """
+        with self._course_lock(course_id):
+            enrolled = self.course_allocations.get(course_id)
+            if enrolled is None or student_id not in enrolled:
+                return False
+            del enrolled[student_id]
+            with self._index_lock:
+                taken = self.student_courses.get(student_id)
+                if taken is not None:
+                    taken.discard(course_id)
+                    if not taken:
+                        del self.student_courses[student_id]
+                self._refresh_busy(student_id)
+            # Promote under the same lock so no later request can take the seat first
+            promoted, passed_over = self._promote(course_id) if promote else ([], [])
+        if self.journal:
+            self.journal('drop', course_id, student_id)
+        self._record_promotions(course_id, promoted, passed_over)
+        return True
+        
+    def _fill_seats(self, course_ids: Iterable[str]):
+        """Promote waitlisted students into whatever seats are free in these courses."""
+        for course_id in course_ids:
+            with self._course_lock(course_id):
+                promoted, passed_over = self._promote(course_id)
+            self._record_promotions(course_id, promoted, passed_over)
+        
+    def _refresh_busy(self, student_id: str):
+        """
+        Rebuild a student's timetable from their courses, noting whether any
+        two of them clash; caller holds _index_lock.
+        """
+        busy = 0
+        clashes = False
+        for course_id in self.student_courses.get(student_id, ()):
+            slots = self.course_slots.get(course_id, 0)
+            clashes = clashes or bool(busy & slots)
+            busy |= slots
+        if clashes:
+            self._clashing[student_id] = None
+        else:
+            self._clashing.pop(student_id, None)
+        if busy:
+            self.student_busy[student_id] = busy
+        else:
+            self.student_busy.pop(student_id, None)
+        
+    def drop_student(self, student_id: str, course_id: str) -> bool:
+        """Take a student out of a course (or off its waitlist)."""
+        if self._drop(student_id, course_id):
+            self.output.emit('dropped', "Student {student_id} dropped from {course_id}",
+                             student_id=student_id, course_id=course_id)
+            return True
+        if self._leave_waitlist(student_id, course_id):
+            self.output.emit('left_waitlist', "Student {student_id} removed from the "
+                             "{course_id} waitlist", student_id=student_id, course_id=course_id)
+            return True
+        self.output.emit('not_enrolled', "Student {student_id} is not enrolled in {course_id}",
+                         student_id=student_id, course_id=course_id)
+        return False
+        
+    def _withdraw(self, student_id: str, promote: bool = True) -> List[str]:
+        """
+        Drop a student from every course they hold and every waitlist they
+        are on; returns the courses they held. With promote=False the freed
+        seats are left for _fill_seats.
+        """
+        for course_id in sorted(self.student_waitlists.get(student_id, ())):
+            self._leave_waitlist(student_id, course_id)
+        courses = self.courses_for_student(student_id)
+        for course_id in courses:
+            self._drop(student_id, course_id, promote)
+        return courses
+        
+    def allocations_report(self, page_size: int = 50) -> Report:
+        """One row per course with its enrolled students, formatted on demand."""
+        return Report('course_allocations', "COURSE ALLOCATIONS", self.course_allocations.items,
+                      lambda item: {'course_id': item[0], 'students': list(item[1])},
+                      "{course_id}: {students}", "No course allocations yet.", page_size)
+                      
+    def display_course_allocations(self, page: Optional[int] = None,
+                                   page_size: int = 50) -> Report:
+        """Show which students are enrolled in each course."""
+        report = self.allocations_report(page_size)
+        report.show(self.output, page)
+        return report
 
 
 class PaymentNode:
     """Represents a single student's payment information in our tracking tree."""
     
+    # No per-node __dict__: the tree can hold hundreds of thousands of these
+    __slots__ = ('student_id', 'amount_paid', 'total_fee', 'balance',
+                 'left', 'right', 'height',
+                 'subtree_size', 'subtree_owed', 'subtree_pending', 'subtree_max_balance')
+    
     def __init__(self, student_id: str, amount_paid: float, total_fee: float):
         self.student_id = student_id
         self.amount_paid = amount_paid
@@ -129,47 +1203,344 @@ class PaymentNode:
         self.balance = total_fee - amount_paid
         self.left = None
         self.right = None
+        # Height of the subtree rooted here (a leaf has height 1)
+        self.height = 1
+        # Totals for the subtree rooted here, kept current by FeeTracking:
+        # how many students, how much they still owe, how many are Pending,
+        # and the largest single balance
+        self.subtree_size = 1
+        self.subtree_owed = self.balance if self.balance > 0 else 0
+        self.subtree_pending = 1 if self.balance > 0 else 0
+        self.subtree_max_balance = self.balance
 
 
+class PaymentRecord(Mapping):
+    """
+    A read-only, dict-like view of one payment node.
+    
+    Lookups and reports hand these out instead of building a fresh dict per
+    record. Values are read from the node when asked for, so a record always
+    shows the node's current state.
+    """
+    
+    __slots__ = ('_node',)
+    _FIELDS = ('student_id', 'amount_paid', 'total_fee', 'balance', 'status')
+    
+    def __init__(self, node: PaymentNode):
+        self._node = node
+        
+    def __getitem__(self, key: str):
+        if key == 'status':
+            return "Cleared" if self._node.balance <= 0 else "Pending"
+        if key in self._FIELDS:
+            return getattr(self._node, key)
+        raise KeyError(key)
+        
+    def __iter__(self):
+        return iter(self._FIELDS)
+        
+    def __len__(self) -> int:
+        return len(self._FIELDS)
+        
+    def __repr__(self) -> str:
+        return repr(dict(self))
+        
+        
 class FeeTracking:
     """
     Tracks student payments using a binary search tree for efficient lookups.
     
     The tree keeps payment records sorted by student ID, making it easy to find
     any student's payment status and generate sorted reports.
+    
+    Student IDs are handed out in order (S000001, S000002, ...), which would
+    turn a plain BST into one long chain. By default the tree rebalances itself
+    after every insert (AVL, like modules in c++/FeeTracking_AVLTree.cpp) so
+    lookups stay O(log n). Pass balanced=False to get the plain BST back.
+    
+    Every node also carries totals for its subtree (students, amount owed,
+    Pending count, largest balance). They are fixed up along the same path as
+    the heights, which gives school-wide totals in O(1) and totals for a
+    student ID range in O(log n).
+    
+    With a PaymentLedger attached, every change is also appended to the ledger
+    as an individual transaction, and record_payment adds to what a student
+    has paid instead of overwriting it.
     """
     
-    def __init__(self):
+    def __init__(self, balanced: bool = True, output: Optional[OutputSink] = None):
+        # Messages go here; by default they are dropped without being formatted
+        self.output = output or NullSink()
         self.root = None
+        self.balanced = balanced
+        # Called as journal(operation, *args) after every change, e.g. by SchoolStore
+        self.journal = None
+        # Optional PaymentLedger that every transaction is appended to
+        self.ledger = None
+        # Serializes changes so two cashiers can't lose each other's payments
+        self._lock = threading.RLock()
         
     def add_payment_record(self, student_id: str, amount_paid: float, total_fee: float) -> bool:
         """Add a new payment record to our tracking system."""
+        if not self._insert(student_id, amount_paid, total_fee):
+            self.output.emit('duplicate_payment',
+                             "Payment record for student {student_id} already exists!",
+                             student_id=student_id)
+            return False
+        self.output.emit('payment_added', "Payment record added for student {student_id}",
+                         student_id=student_id, amount_paid=amount_paid, total_fee=total_fee)
+        return True
+        
+    def _insert(self, student_id: str, amount_paid: float, total_fee: float) -> bool:
+        """Put a new node in the tree; False if the student already has one."""
+        with self._lock:
+            if not self._insert_node(student_id, amount_paid, total_fee):
+                return False
+            if self.ledger:
+                self.ledger.append('open', student_id, amount_paid, total_fee)
+        return True
+        
+    def _insert_node(self, student_id: str, amount_paid: float, total_fee: float) -> bool:
         new_node = PaymentNode(student_id, amount_paid, total_fee)
         
         if self.root is None:
             self.root = new_node
-            print(f"Payment record added for student {student_id}")
+            if self.journal:
+                self.journal('save_payment', student_id, amount_paid, total_fee)
             return True
             
-        # Find the right spot in the tree for this student
+        # Find the right spot in the tree for this student, remembering the
+        # way down so we can fix heights on the way back up
+        path = []
         current = self.root
         while current:
+            path.append(current)
             if student_id < current.student_id:
                 if current.left is None:
                     current.left = new_node
-                    print(f"Payment record added for student {student_id}")
-                    return True
+                    break
                 current = current.left
             elif student_id > current.student_id:
                 if current.right is None:
                     current.right = new_node
-                    print(f"Payment record added for student {student_id}")
-                    return True
+                    break
                 current = current.right
             else:
-                print(f"Payment record for student {student_id} already exists!")
                 return False
                 
+        self._rebalance_path(path)
+        if self.journal:
+            self.journal('save_payment', student_id, amount_paid, total_fee)
+        return True
+        
+    def bulk_load(self, records: Iterable[Tuple[str, float, float]]) -> Dict[str, int]:
+        """
+        Add many (student_id, amount_paid, total_fee) records without printing each one.
+        
+        Records with a blank ID or non-numeric amounts are rejected; students
+        who already have a record count as duplicates.
+        When the tree starts out empty the records are sorted once and the
+        tree is built perfectly balanced in a single pass, instead of
+        rotating after every insert. Returns how many records were inserted,
+        duplicated and rejected.
+        """
+        summary = {'inserted': 0, 'duplicates': 0, 'rejected': 0}
+        valid = []
+        for student_id, amount_paid, total_fee in records:
+            try:
+                amount_paid, total_fee = float(amount_paid), float(total_fee)
+            except (TypeError, ValueError):
+                summary['rejected'] += 1
+                continue
+            if not student_id:
+                summary['rejected'] += 1
+                continue
+            valid.append((student_id, amount_paid, total_fee))
+            
+        with self._lock:
+            if self.root is not None:
+                for student_id, amount_paid, total_fee in valid:
+                    if self._insert(student_id, amount_paid, total_fee):
+                        summary['inserted'] += 1
+                    else:
+                        summary['duplicates'] += 1
+                return summary
+                
+            valid.sort(key=lambda record: record[0])
+            nodes = []
+            for student_id, amount_paid, total_fee in valid:
+                if nodes and nodes[-1].student_id == student_id:
+                    summary['duplicates'] += 1
+                    continue
+                nodes.append(PaymentNode(student_id, amount_paid, total_fee))
+                if self.journal:
+                    self.journal('save_payment', student_id, amount_paid, total_fee)
+                if self.ledger:
+                    self.ledger.append('open', student_id, amount_paid, total_fee)
+            self.root = self._build_balanced(nodes, 0, len(nodes))
+        summary['inserted'] = len(nodes)
+        return summary
+        
+    def _build_balanced(self, nodes: List[PaymentNode], lo: int, hi: int) -> Optional[PaymentNode]:
+        """Link sorted nodes[lo:hi] into a balanced subtree (recursion depth is only log n)."""
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        node = nodes[mid]
+        node.left = self._build_balanced(nodes, lo, mid)
+        node.right = self._build_balanced(nodes, mid + 1, hi)
+        self._refresh(node)
+        return node
+        
+    @staticmethod
+    def _height(node: Optional[PaymentNode]) -> int:
+        return node.height if node else 0
+        
+    def _refresh(self, node: PaymentNode):
+        """Recompute a node's height and subtree totals from its children."""
+        balance = node.balance
+        height, size = 0, 1
+        owed = balance if balance > 0 else 0
+        pending = 1 if balance > 0 else 0
+        max_balance = balance
+        for child in (node.left, node.right):
+            if child is not None:
+                if child.height > height:
+                    height = child.height
+                size += child.subtree_size
+                owed += child.subtree_owed
+                pending += child.subtree_pending
+                if child.subtree_max_balance > max_balance:
+                    max_balance = child.subtree_max_balance
+        node.height = height + 1
+        node.subtree_size = size
+        node.subtree_owed = owed
+        node.subtree_pending = pending
+        node.subtree_max_balance = max_balance
+        
+    def _rotate_right(self, y: PaymentNode) -> PaymentNode:
+        x = y.left
+        y.left = x.right
+        x.right = y
+        self._refresh(y)
+        self._refresh(x)
+        return x
+        
+    def _rotate_left(self, x: PaymentNode) -> PaymentNode:
+        y = x.right
+        x.right = y.left
+        y.left = x
+        self._refresh(x)
+        self._refresh(y)
+        return y
+        
+    def _rebalance(self, node: PaymentNode) -> PaymentNode:
+        """Restore the AVL property at a node and return the new subtree root."""
+        balance = self._height(node.left) - self._height(node.right)
+        if balance > 1:
+            if self._height(node.left.left) < self._height(node.left.right):
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if self._height(node.right.right) < self._height(node.right.left):
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+        
+    def _rebalance_path(self, path: List[PaymentNode]):
+        """Walk back up an insert/delete path fixing heights and balance."""
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            self._refresh(node)
+            if not self.balanced:
+                continue
+            subtree = self._rebalance(node)
+            if subtree is node:
+                continue
+            # A rotation moved a new node to the top of this subtree
+            if i == 0:
+                self.root = subtree
+            elif path[i - 1].left is node:
+                path[i - 1].left = subtree
+            else:
+                path[i - 1].right = subtree
+                
+    def tree_height(self) -> int:
+        """How many levels the payment tree has (0 when empty)."""
+        return self._height(self.root)
+        
+    def _replace_child(self, parent: Optional[PaymentNode], old: PaymentNode,
+                       new: Optional[PaymentNode]):
+        if parent is None:
+            self.root = new
+        elif parent.left is old:
+            parent.left = new
+        else:
+            parent.right = new
+            
+    def _delete(self, student_id: str) -> Optional[PaymentNode]:
+        """Unlink a student's node from the tree and rebalance; returns the node."""
+        with self._lock:
+            node = self._delete_node(student_id)
+            if node is not None and self.ledger:
+                self.ledger.append('close', student_id)
+        return node
+        
+    def _delete_node(self, student_id: str) -> Optional[PaymentNode]:
+        path = []
+        node = self.root
+        while node and node.student_id != student_id:
+            path.append(node)
+            node = node.left if student_id < node.student_id else node.right
+        if node is None:
+            return None
+            
+        parent = path[-1] if path else None
+        if node.left and node.right:
+            # Move the in-order successor (smallest node on the right) into
+            # this node's place. Nodes are relinked rather than having their
+            # data copied, so PaymentRecord views stay attached to the right student.
+            successor_path = []
+            successor = node.right
+            while successor.left:
+                successor_path.append(successor)
+                successor = successor.left
+            if successor_path:
+                successor_path[-1].left = successor.right
+                successor.right = node.right
+            successor.left = node.left
+            self._replace_child(parent, node, successor)
+            path.append(successor)
+            path.extend(successor_path)
+        else:
+            self._replace_child(parent, node, node.left or node.right)
+            
+        node.left = node.right = None
+        self._rebalance_path(path)
+        if self.journal:
+            self.journal('delete_payment', student_id)
+        return node
+        
+    def delete_payment_record(self, student_id: str) -> bool:
+        """Remove a student's payment record."""
+        if self._delete(student_id) is None:
+            self.output.emit('payment_not_found', "Payment record not found!", student_id=student_id)
+            return False
+        self.output.emit('payment_deleted', "Payment record deleted for student {student_id}",
+                         student_id=student_id)
+        return True
+        
+    def _search_path(self, student_id: str) -> List[PaymentNode]:
+        """Nodes from the root down to a student's node (empty if not found)."""
+        path = []
+        current = self.root
+        while current:
+            path.append(current)
+            if student_id == current.student_id:
+                return path
+            current = current.left if student_id < current.student_id else current.right
+        return []
+        
     def _search_node(self, student_id: str) -> Optional[PaymentNode]:
         """Find a student's payment record in the tree."""
         current = self.root
@@ -182,196 +1553,1274 @@ class FeeTracking:
                 current = current.right
         return None
         
+    @staticmethod
+    def _node_record(node: PaymentNode) -> PaymentRecord:
+        """Wrap a tree node in the record view we hand back to callers."""
+        return PaymentRecord(node)
+        
     def search_payment_record(self, student_id: str) -> Optional[Dict]:
         """Look up a student's payment details."""
         node = self._search_node(student_id)
         if node:
-            status = "Cleared" if node.balance <= 0 else "Pending"
-            record = {
-                'student_id': node.student_id,
-                'amount_paid': node.amount_paid,
-                'total_fee': node.total_fee,
-                'balance': node.balance,
-                'status': status
-            }
-            print(f"Payment Record: {record}")
+            record = self._node_record(node)
+            self.output.emit('payment_found', "Payment Record: {record}", record=record)
             return record
         else:
-            print("Payment record not found!")
+            self.output.emit('payment_not_found', "Payment record not found!", student_id=student_id)
             return None
             
     def update_payment_record(self, student_id: str, new_amount: float) -> bool:
         """Update how much a student has paid."""
-        node = self._search_node(student_id)
+        # Stored as given (not as old + difference, which can round a paid-up
+        # student back to Pending) and logged as a 'set' entry
+        node = self._apply_payment(student_id, new_amount, absolute=True)
         if node:
-            node.amount_paid = new_amount
-            node.balance = node.total_fee - new_amount
-            print(f"Payment record updated for student {student_id}")
+            self.output.emit('payment_updated', "Payment record updated for student {student_id}",
+                             student_id=student_id, amount_paid=new_amount)
             return True
         else:
-            print("Payment record not found!")
+            self.output.emit('payment_not_found', "Payment record not found!", student_id=student_id)
             return False
             
-    def _inorder_traversal(self, node: PaymentNode, result: List):
-        """Collect all payment records in sorted order."""
-        if node:
-            self._inorder_traversal(node.left, result)
-            status = "Cleared" if node.balance <= 0 else "Pending"
-            result.append({
-                'student_id': node.student_id,
-                'amount_paid': node.amount_paid,
-                'total_fee': node.total_fee,
-                'balance': node.balance,
-                'status': status
-            })
-            self._inorder_traversal(node.right, result)
-            
-    def generate_fee_clearance_report(self):
-        """Create a sorted list of all students' payment statuses."""
-        if self.root is None:
-            print("No payment records available.")
-            return
+    def _apply_payment(self, student_id: str, amount: float,
+                       absolute: bool = False) -> Optional[PaymentNode]:
+        """
+        Add amount to what a student has paid (or, if absolute, make it the
+        amount paid), without printing.
+        """
+        with self._lock:
+            path = self._search_path(student_id)
+            if not path:
+                return None
+            node = path[-1]
+            if absolute:
+                node.amount_paid = amount
+            else:
+                node.amount_paid += amount
+            node.balance = node.total_fee - node.amount_paid
+            # The shape didn't change, only the totals above this node
+            for ancestor in reversed(path):
+                self._refresh(ancestor)
+            if self.journal:
+                self.journal('save_payment', student_id, node.amount_paid, node.total_fee)
+            if self.ledger:
+                self.ledger.append('set' if absolute else 'pay', student_id, amount)
+        return node
+        
+    def record_payment(self, student_id: str, amount: float) -> bool:
+        """Add a payment (or a refund, if negative) to what a student has paid."""
+        node = self._apply_payment(student_id, amount)
+        if node is None:
+            self.output.emit('payment_not_found', "Payment record not found!", student_id=student_id)
+            return False
+        self.output.emit('payment_recorded',
+                         "Payment of {amount} recorded for student {student_id}, "
+                         "balance now {balance}",
+                         student_id=student_id, amount=amount, balance=node.balance)
+        return True
+            
+    def fee_totals(self) -> Dict[str, float]:
+        """School-wide totals, read straight off the root in O(1)."""
+        root = self.root
+        if root is None:
+            return {'students': 0, 'pending': 0, 'cleared': 0, 'outstanding': 0,
+                    'max_balance': None}
+        return {
+            'students': root.subtree_size,
+            'pending': root.subtree_pending,
+            'cleared': root.subtree_size - root.subtree_pending,
+            'outstanding': root.subtree_owed,
+            'max_balance': root.subtree_max_balance,
+        }
+        
+    def _totals_below(self, student_id: str, inclusive: bool) -> Tuple[int, int, float]:
+        """(students, pending, outstanding) for IDs before student_id (or up to it)."""
+        size = pending = 0
+        owed = 0
+        node = self.root
+        while node:
+            if node.student_id < student_id or (inclusive and node.student_id == student_id):
+                # This node and everything on its left are in range
+                if node.left:
+                    size += node.left.subtree_size
+                    pending += node.left.subtree_pending
+                    owed += node.left.subtree_owed
+                size += 1
+                if node.balance > 0:
+                    pending += 1
+                    owed += node.balance
+                node = node.right
+            else:
+                node = node.left
+        return size, pending, owed
+        
+    def range_totals(self, start_id: Optional[str] = None,
+                     end_id: Optional[str] = None) -> Dict[str, float]:
+        """Totals for student IDs between start_id and end_id (inclusive) in O(log n)."""
+        if end_id is None:
+            totals = self.fee_totals()
+            high = (totals['students'], totals['pending'], totals['outstanding'])
+        else:
+            high = self._totals_below(end_id, inclusive=True)
+        low = (0, 0, 0) if start_id is None else self._totals_below(start_id, inclusive=False)
+        students, pending, owed = (h - l for h, l in zip(high, low))
+        if students < 0:  # start_id after end_id
+            students, pending, owed = 0, 0, 0
+        return {'students': students, 'pending': pending,
+                'cleared': students - pending, 'outstanding': owed}
+                
+    def top_debtors(self, k: int = 100) -> List[PaymentRecord]:
+        """
+        The k students with the largest balances still owed, largest first.
+        
+        Subtrees are explored best-first by their largest balance, so only
+        about k paths through the tree are visited: O(k log n).
+        """
+        result = []
+        if self.root is None or k <= 0:
+            return result
+        # Entries are (-priority, tie_breaker, node, is_subtree)
+        frontier = [(-self.root.subtree_max_balance, 0, self.root, True)]
+        counter = 1
+        while frontier and len(result) < k:
+            neg_balance, _, node, is_subtree = heapq.heappop(frontier)
+            if -neg_balance <= 0:
+                break  # nobody left who owes anything
+            if not is_subtree:
+                result.append(PaymentRecord(node))
+                continue
+            heapq.heappush(frontier, (-node.balance, counter, node, False))
+            counter += 1
+            for child in (node.left, node.right):
+                if child is not None:
+                    heapq.heappush(frontier, (-child.subtree_max_balance, counter, child, True))
+                    counter += 1
+        return result
+        
+    def iter_nodes(self, start_id: Optional[str] = None,
+                   end_id: Optional[str] = None) -> Iterator[PaymentNode]:
+        """
+        Walk the tree in student ID order using an explicit stack.
+        
+        Only IDs between start_id and end_id (both inclusive, either may be
+        left open) are visited, and subtrees outside that range are skipped
+        entirely. Nothing is collected up front, so memory stays at one stack
+        entry per tree level no matter how many records there are.
+        """
+        stack = []
+        current = self.root
+        while stack or current:
+            # Slide down to the smallest node that is still in range
+            while current:
+                if start_id is not None and current.student_id < start_id:
+                    current = current.right
+                else:
+                    stack.append(current)
+                    current = current.left
+            if not stack:
+                return
+            node = stack.pop()
+            if end_id is not None and node.student_id > end_id:
+                return
+            yield node
+            current = node.right
+            
+    def iter_payment_records(self, start_id: Optional[str] = None,
+                             end_id: Optional[str] = None,
+                             status: Optional[str] = None) -> Iterator[Dict]:
+        """Lazily yield payment records in ID order, optionally only 'Pending' or 'Cleared'."""
+        for node in self.iter_nodes(start_id, end_id):
+            if status is None or ("Cleared" if node.balance <= 0 else "Pending") == status:
+                yield PaymentRecord(node)
+                
+    def fee_clearance_report(self, start_id: Optional[str] = None,
+                             end_id: Optional[str] = None,
+                             status: Optional[str] = None,
+                             page_size: int = 50) -> Report:
+        """Payment statuses in student ID order, formatted on demand."""
+        return Report('fee_clearance', "FEE CLEARANCE REPORT",
+                      lambda: self.iter_payment_records(start_id, end_id, status), dict,
+                      "ID: {student_id}, Paid: ${amount_paid}, Total: ${total_fee}, "
+                      "Balance: ${balance}, Status: {status}",
+                      "No payment records available.", page_size)
+                      
+    def generate_fee_clearance_report(self, start_id: Optional[str] = None,
+                                      end_id: Optional[str] = None,
+                                      status: Optional[str] = None,
+                                      out: Optional[TextIO] = None,
+                                      page: Optional[int] = None) -> int:
+        """
+        Create a sorted list of all students' payment statuses.
+        
+        Records are written one at a time as the tree is walked, so the report
+        can go straight to a file or socket (out) without building it in memory.
+        Without out it goes to this module's output sink. Returns how many
+        records were written.
+        """
+        report = self.fee_clearance_report(start_id, end_id, status)
+        if out is not None:
+            return report.write(out, page)
+        return report.show(self.output, page)
+
+
+class PaymentLedger:
+    """
+    An append-only log of every payment transaction, one JSON array per line.
+    
+    Entries are ["open", seq, time, student_id, amount_paid, total_fee] for a
+    new fee record, ["pay", seq, time, student_id, amount] for a payment (or a
+    negative refund), ["set", seq, time, student_id, amount_paid] for a
+    correction that overwrites the amount paid, and
+    ["close", seq, time, student_id] when a record is deleted. Nothing is ever rewritten, so a student's full payment
+    history can always be reconstructed.
+    
+    Writes go through a buffer and are fsync'd in batches: after
+    fsync_every entries or fsync_interval seconds, whichever comes first.
+    A background thread enforces the interval, so entries written just
+    before a quiet spell don't sit in the buffer until the next append;
+    close() stops it and syncs what is left.
+    checkpoint() writes a snapshot of the current balances together with the
+    log position it covers, so restore() only replays what came after it.
+    """
+    
+    def __init__(self, path: str, fsync_every: int = 256, fsync_interval: float = 1.0):
+        self.path = path
+        self.snapshot_path = path + ".snapshot"
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = open(path, "ab")
+        self._seq = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        if fsync_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_periodically,
+                                             name="payment-ledger-flush", daemon=True)
+            self._flusher.start()
+        
+    def append(self, kind: str, student_id: str, *amounts: float):
+        """Add one transaction to the log (durable by the next batched fsync)."""
+        with self._lock:
+            self._seq += 1
+            entry = [kind, self._seq, time.time(), student_id, *amounts]
+            self._file.write(json.dumps(entry).encode() + b"\n")
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+                
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        
+    def _flush_periodically(self):
+        while not self._closed.wait(self.fsync_interval):
+            with self._lock:
+                if (self._unsynced and not self._file.closed
+                        and time.monotonic() - self._last_sync >= self.fsync_interval):
+                    self._sync()
+                    
+    def flush(self):
+        """Force everything written so far onto disk."""
+        with self._lock:
+            self._sync()
+            
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self._file.close()
+        
+    def checkpoint(self, fees: FeeTracking):
+        """
+        Snapshot every balance along with the log offset it is valid up to.
+        
+        The snapshot goes to a temporary file that then replaces the old one,
+        so a crash mid-checkpoint leaves the previous snapshot intact.
+        """
+        with fees._lock, self._lock:
+            self._sync()
+            snapshot = {
+                'offset': self._file.tell(),
+                'seq': self._seq,
+                'records': [[node.student_id, node.amount_paid, node.total_fee]
+                            for node in fees.iter_nodes()],
+            }
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w") as out:
+            json.dump(snapshot, out, separators=(",", ":"))
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        
+    def _read_entries(self, offset: int = 0) -> Tuple[List[list], int]:
+        """
+        Every complete log entry from offset on, decoded in a single json call,
+        and the offset just past the last complete one.
+        """
+        with self._lock:
+            self._file.flush()
+            with open(self.path, "rb") as log:
+                log.seek(offset)
+                data = log.read()
+        # A crash can leave a half-written last line; it never made it, so drop it
+        end = data.rfind(b"\n")
+        if end < 0:
+            return [], offset
+        lines = data[:end].decode().replace("\n", ",")
+        return json.loads("[" + lines + "]"), offset + end + 1
+        
+    def restore(self, fees: FeeTracking) -> int:
+        """
+        Rebuild an empty FeeTracking from the latest snapshot plus the log
+        entries written after it, then attach this ledger to it.
+        
+        Only the tail of the log after the snapshot is replayed, and it is
+        folded into plain per-student balances first so the tree is built once
+        with bulk_load instead of being rebalanced for every entry. Returns
+        how many log entries were replayed.
+        """
+        offset = 0
+        balances = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+            offset = snapshot['offset']
+            self._seq = snapshot['seq']
+            balances = {record[0]: record for record in snapshot['records']}
             
-        result = []
-        self._inorder_traversal(self.root, result)
+        entries, end = self._read_entries(offset)
+        # Cut off any torn line so new entries don't get glued onto it
+        self._file.truncate(end)
+        # Same rules as the tree: a second 'open' or a 'pay' for an unknown student is ignored
+        for entry in entries:
+            kind, seq, _, student_id = entry[:4]
+            if kind == 'open':
+                if student_id not in balances:
+                    balances[student_id] = [student_id, entry[4], entry[5]]
+            elif kind == 'pay':
+                record = balances.get(student_id)
+                if record is not None:
+                    record[1] += entry[4]
+            elif kind == 'set':
+                record = balances.get(student_id)
+                if record is not None:
+                    record[1] = entry[4]
+            elif kind == 'close':
+                balances.pop(student_id, None)
+            self._seq = max(self._seq, seq)
+        fees.bulk_load(balances.values())
+        fees.ledger = self
+        return len(entries)
         
-        print("\n=== FEE CLEARANCE REPORT ===")
-        for record in result:
-            print(f"ID: {record['student_id']}, Paid: ${record['amount_paid']}, "
-                  f"Total: ${record['total_fee']}, Balance: ${record['balance']}, "
-                  f"Status: {record['status']}")
-
-
+    def history(self, student_id: str) -> List[Dict]:
+        """Every transaction ever logged for one student, oldest first (scans the log)."""
+        return [{'kind': entry[0], 'seq': entry[1], 'time': entry[2], 'amounts': entry[4:]}
+                for entry in self._read_entries()[0] if entry[3] == student_id]
+                
+                
 class LibrarySystem:
     """
     Manages book borrowing and returns using quick-access storage.
     
     We use a dictionary to instantly find books by their ISBN number,
     making checkouts and returns fast and efficient.
+    
+    Each book's borrowers are a Counter (student_id -> copies held), and every
+    loan is also indexed by student, so returns, "what does this student
+    have" and "who has this book" never scan a list or the whole catalogue.
+    
+    Titles are split into lowercase words and kept in an inverted index
+    (word -> ISBNs) plus a sorted word list, so search_books can match whole
+    words and word prefixes without looking at every book.
+    
+    Every loan has a due date and sits in a min-heap keyed by it.
+    sweep_overdue(now) only pops the loans that have come due, so running it
+    every minute costs nothing for loans that aren't due yet.
     """
     
-    def __init__(self):
+    # Default loan period
+    LOAN_DAYS = 14
+    
+    def __init__(self, output: Optional[OutputSink] = None):
+        # Messages go here; by default they are dropped without being formatted
+        self.output = output or NullSink()
         self.books = {}
+        # Every open loan by loan ID, oldest first:
+        # {'isbn': ..., 'student_id': ..., 'borrowed_at': timestamp, 'due_at': timestamp}
+        self.loans = {}
+        # (due_at, loan_id) for loans not yet swept; returned loans are skipped lazily
+        self._due_heap = []
+        # Open loans that sweep_overdue has already found to be overdue
+        self.overdue = set()
+        # student_id -> {isbn: deque of that student's loan IDs for the book}
+        self.student_loans = {}
+        self._next_loan_id = 0
+        # Title search: word -> set of ISBNs, and every indexed word in sorted order
+        self.title_index = {}
+        self._title_words = []
+        # Called as journal(operation, *args) after every change, e.g. by SchoolStore
+        self.journal = None
         
     def add_book(self, isbn: str, title: str, copies: int):
         """Add a new book to the library collection."""
+        self._catalogue(isbn, title, copies)
+        self.output.emit('book_added', "Book '{title}' (ISBN: {isbn}) added with {copies} copies.",
+                         isbn=isbn, title=title, copies=copies)
+        
+    def _catalogue(self, isbn: str, title: str, copies: int):
+        """Add or replace a book without printing."""
+        # Re-adding a book keeps track of the copies that are still out
+        borrowers = Counter()
+        if isbn in self.books:
+            borrowers = self.books[isbn]['borrowers']
+            self._unindex_title(isbn, self.books[isbn]['title'])
+        self._index_title(isbn, title)
         self.books[isbn] = {
             'title': title,
             'total_copies': copies,
-            'available_copies': copies,
-            'borrowers': []
+            'available_copies': copies - sum(borrowers.values()),
+            'borrowers': borrowers
         }
-        print(f"Book '{title}' (ISBN: {isbn}) added with {copies} copies.")
+        if self.journal:
+            self.journal('save_book', isbn, title, copies)
         
-    def borrow_book(self, isbn: str, student_id: str) -> bool:
-        """Check out a book to a student."""
-        if isbn not in self.books:
-            print("Book Not Found!")
-            return False
+    def bulk_load(self, books: Iterable[Tuple[str, str, int]]) -> Dict[str, int]:
+        """
+        Add many (isbn, title, copies) books without printing each one.
+        
+        Books with a blank ISBN or a copy count that isn't a whole number are
+        rejected. ISBNs already in the catalogue count as duplicates and are
+        left untouched. Returns how many books were inserted, duplicated and
+        rejected.
+        """
+        summary = {'inserted': 0, 'duplicates': 0, 'rejected': 0}
+        new_words = []
+        try:
+            for isbn, title, copies in books:
+                if not isbn or not isinstance(copies, int):
+                    summary['rejected'] += 1
+                elif isbn in self.books:
+                    summary['duplicates'] += 1
+                else:
+                    self.books[isbn] = {
+                        'title': title,
+                        'total_copies': copies,
+                        'available_copies': copies,
+                        'borrowers': Counter()
+                    }
+                    self._index_title(isbn, title, new_words)
+                    if self.journal:
+                        self.journal('save_book', isbn, title, copies)
+                    summary['inserted'] += 1
+        finally:
+            # One sort for the whole batch instead of an insort per new word;
+            # done even if a bad row stops the batch, so the books already
+            # added can still be found
+            if new_words:
+                self._title_words.extend(new_words)
+                self._title_words.sort()
+        return summary
+        
+    @staticmethod
+    def _title_tokens(text: str) -> List[str]:
+        """Lowercase words of a title or query, with accents and punctuation dropped."""
+        return re.findall(r"[^\W_]+", _fold(text))
+        
+    def _index_title(self, isbn: str, title: str, new_words: Optional[List[str]] = None):
+        # With new_words, words not seen before are collected there for the
+        # caller to merge into _title_words in one go instead of one insort each
+        for word in set(self._title_tokens(title)):
+            isbns = self.title_index.get(word)
+            if isbns is None:
+                isbns = self.title_index[word] = set()
+                if new_words is None:
+                    bisect.insort(self._title_words, word)
+                else:
+                    new_words.append(word)
+            isbns.add(isbn)
             
-        book = self.books[isbn]
+    def _unindex_title(self, isbn: str, title: str):
+        for word in set(self._title_tokens(title)):
+            isbns = self.title_index.get(word)
+            if isbns is None:
+                continue
+            isbns.discard(isbn)
+            if not isbns:
+                del self.title_index[word]
+                i = bisect.bisect_left(self._title_words, word)
+                if i < len(self._title_words) and self._title_words[i] == word:
+                    del self._title_words[i]
+                
+    def _prefix_matches(self, prefix: str) -> set:
+        """All ISBNs with a title word starting with prefix."""
+        words = self._title_words
+        start = bisect.bisect_left(words, prefix)
+        end = bisect.bisect_left(words, prefix + '\U0010ffff', start)
+        if end - start == 1:
+            return self.title_index[words[start]]
+        matches = set()
+        for word in words[start:end]:
+            matches |= self.title_index[word]
+        return matches
+        
+    def search_books(self, query: str, limit: int = 10) -> List[Tuple[str, str]]:
+        """
+        Find books whose titles contain every word of the query.
+        
+        Each query word may also match the start of a title word ("alg" finds
+        "Algorithms"). Books that match whole words rank above prefix-only
+        matches, then shorter titles come first. Returns up to limit
+        (isbn, title) pairs.
+        """
+        words = self._title_tokens(query)
+        if not words or limit <= 0:
+            return []
+            
+        # Narrow down from the rarest word to keep the intersections small
+        word_matches = sorted((self._prefix_matches(word) for word in words), key=len)
+        candidates = set(word_matches[0])
+        for matches in word_matches[1:]:
+            candidates &= matches
+            if not candidates:
+                return []
+                
+        def rank(isbn: str):
+            exact = sum(1 for word in words if isbn in self.title_index.get(word, ()))
+            title = self.books[isbn]['title']
+            return (-exact, len(title), title)
+            
+        return [(isbn, self.books[isbn]['title'])
+                for isbn in heapq.nsmallest(limit, candidates, key=rank)]
+                
+    def _lend(self, isbn: str, student_id: str, borrowed_at: Optional[float] = None,
+              due_at: Optional[float] = None) -> str:
+        """
+        Check out a book without printing.
+        
+        The loan is due LOAN_DAYS after borrowed_at unless due_at is given.
+        Returns 'borrowed', 'not_found' or 'unavailable'.
+        """
+        book = self.books.get(isbn)
+        if book is None:
+            return 'not_found'
         if book['available_copies'] <= 0:
-            print("Book Unavailable!")
-            return False
+            return 'unavailable'
             
+        if borrowed_at is None:
+            borrowed_at = time.time()
+        if due_at is None:
+            due_at = borrowed_at + self.LOAN_DAYS * 86400
+        loan_id = self._next_loan_id
+        self._next_loan_id += 1
+        self.loans[loan_id] = {'isbn': isbn, 'student_id': student_id,
+                               'borrowed_at': borrowed_at, 'due_at': due_at}
+        heapq.heappush(self._due_heap, (due_at, loan_id))
+        self.student_loans.setdefault(student_id, {}).setdefault(isbn, deque()).append(loan_id)
         book['available_copies'] -= 1
-        book['borrowers'].append(student_id)
-        print(f"Student {student_id} borrowed '{book['title']}'")
+        book['borrowers'][student_id] += 1
+        if self.journal:
+            self.journal('add_loan', isbn, student_id, borrowed_at, due_at)
+        return 'borrowed'
+        
+    def _take_back(self, isbn: str, student_id: str) -> str:
+        """
+        Return a student's oldest copy of a book without printing.
+        
+        Returns 'returned', 'not_found' or 'not_borrowed'.
+        """
+        book = self.books.get(isbn)
+        if book is None:
+            return 'not_found'
+        held = self.student_loans.get(student_id, {}).get(isbn)
+        if not held:
+            return 'not_borrowed'
+            
+        loan_id = held.popleft()
+        del self.loans[loan_id]
+        self.overdue.discard(loan_id)
+        # Rebuild the due-date heap once returned loans make up most of it
+        if len(self._due_heap) > 2 * len(self.loans) + 16:
+            self._due_heap = [entry for entry in self._due_heap if entry[1] in self.loans]
+            heapq.heapify(self._due_heap)
+        if not held:
+            del self.student_loans[student_id][isbn]
+            if not self.student_loans[student_id]:
+                del self.student_loans[student_id]
+        book['available_copies'] += 1
+        book['borrowers'][student_id] -= 1
+        if book['borrowers'][student_id] <= 0:
+            del book['borrowers'][student_id]
+        if self.journal:
+            self.journal('remove_loan', isbn, student_id)
+        return 'returned'
+        
+    def borrow_book(self, isbn: str, student_id: str, due_at: Optional[float] = None) -> bool:
+        """Check out a book to a student (due in LOAN_DAYS days unless due_at is given)."""
+        outcome = self._lend(isbn, student_id, due_at=due_at)
+        if outcome == 'not_found':
+            self.output.emit('book_not_found', "Book Not Found!", isbn=isbn)
+            return False
+        if outcome == 'unavailable':
+            self.output.emit('book_unavailable', "Book Unavailable!", isbn=isbn)
+            return False
+        self.output.emit('book_borrowed', "Student {student_id} borrowed '{title}'",
+                         isbn=isbn, student_id=student_id, title=self.books[isbn]['title'])
         return True
         
     def return_book(self, isbn: str, student_id: str) -> bool:
         """Return a borrowed book to the library."""
-        if isbn not in self.books:
-            print("Book Not Found!")
+        outcome = self._take_back(isbn, student_id)
+        if outcome == 'not_found':
+            self.output.emit('book_not_found', "Book Not Found!", isbn=isbn)
             return False
-            
-        book = self.books[isbn]
-        if student_id in book['borrowers']:
-            book['available_copies'] += 1
-            book['borrowers'].remove(student_id)
-            print(f"Student {student_id} returned '{book['title']}'")
-            return True
-        else:
-            print(f"Student {student_id} didn't borrow this book!")
+        if outcome == 'not_borrowed':
+            self.output.emit('book_not_borrowed', "Student {student_id} didn't borrow this book!",
+                             isbn=isbn, student_id=student_id)
             return False
+        self.output.emit('book_returned', "Student {student_id} returned '{title}'",
+                         isbn=isbn, student_id=student_id, title=self.books[isbn]['title'])
+        return True
+        
+    def _release_loans(self, student_id: str) -> List[Dict]:
+        """Close every loan a student has open, without printing; returns the loans."""
+        loans = self.loans_for_student(student_id)
+        for loan in loans:
+            self._take_back(loan['isbn'], student_id)
+        return loans
+        
+    def loans_for_student(self, student_id: str) -> List[Dict]:
+        """Every book a student currently has out, oldest loan first per book."""
+        return [dict(self.loans[loan_id], loan_id=loan_id)
+                for loan_ids in self.student_loans.get(student_id, {}).values()
+                for loan_id in loan_ids]
+                
+    def who_has(self, isbn: str) -> Dict[str, int]:
+        """Which students have a book out, and how many copies each."""
+        book = self.books.get(isbn)
+        return dict(book['borrowers']) if book else {}
+        
+    def sweep_overdue(self, now: Optional[float] = None) -> List[Dict]:
+        """
+        Find the loans that have become overdue since the last sweep.
+        
+        Pops due-date heap entries up to now, so the cost is O(k log n) for k
+        loans that came due; loans that aren't due yet are never looked at.
+        Returns the newly overdue loans, earliest due first.
+        """
+        now = time.time() if now is None else now
+        newly_overdue = []
+        while self._due_heap and self._due_heap[0][0] <= now:
+            _, loan_id = heapq.heappop(self._due_heap)
+            loan = self.loans.get(loan_id)
+            if loan is None:  # already returned
+                continue
+            self.overdue.add(loan_id)
+            newly_overdue.append(dict(loan, loan_id=loan_id))
+        return newly_overdue
+        
+    def overdue_loans(self, now: Optional[float] = None) -> List[Dict]:
+        """Every open loan that is past its due date, earliest due first."""
+        self.sweep_overdue(now)
+        return sorted((dict(self.loans[loan_id], loan_id=loan_id) for loan_id in self.overdue),
+                      key=lambda loan: (loan['due_at'], loan['loan_id']))
             
-    def check_availability(self, isbn: str):
+    def check_availability(self, isbn: str) -> Optional[Dict]:
         """Check how many copies of a book are available."""
         if isbn not in self.books:
-            print("Book Not Found!")
-            return
+            self.output.emit('book_not_found', "Book Not Found!", isbn=isbn)
+            return None
             
         book = self.books[isbn]
-        print(f"Book '{book['title']}': {book['available_copies']} copies available "
-              f"out of {book['total_copies']} total.")
+        availability = {'isbn': isbn, 'title': book['title'],
+                        'available_copies': book['available_copies'],
+                        'total_copies': book['total_copies']}
+        self.output.emit('book_availability',
+                         "Book '{title}': {available_copies} copies available "
+                         "out of {total_copies} total.", **availability)
+        return availability
 
 
+class ScoreMatrix:
+    """
+    Stores every student's assessment scores in one dense NumPy array.
+    
+    Rows are students and columns are assessments, the same layout as
+    modules in c++/PerformanceAnalytics_Matrix.cpp. Missing assessments are NaN.
+    student_index and assessment_index map IDs to rows and columns, and
+    student_ids / assessment_ids give the IDs back in row/column order, so the
+    arrays returned by the statistics methods line up with them.
+    
+    Statistics are computed for all students or all assessments at once with
+    vectorized NumPy operations instead of a Python loop per record.
+    """
+    
+    def __init__(self, assessment_ids: Iterable[str] = (), initial_rows: int = 1024):
+        if np is None:
+            raise ImportError("ScoreMatrix needs NumPy (pip install numpy)")
+        self.student_index = {}
+        self.assessment_index = {}
+        self.student_ids = []
+        self.assessment_ids = []
+        # Spare rows/columns are kept so adding a student doesn't copy the array
+        self._data = np.full((max(initial_rows, 1), 8), np.nan)
+        for assessment_id in assessment_ids:
+            self._column(assessment_id)
+            
+    @property
+    def scores(self) -> "np.ndarray":
+        """The filled part of the matrix (a view, not a copy)."""
+        return self._data[:len(self.student_ids), :len(self.assessment_ids)]
+        
+    def _grow(self, rows: int, cols: int):
+        """Make room for at least rows x cols, doubling so growth stays cheap."""
+        old_rows, old_cols = self._data.shape
+        if rows <= old_rows and cols <= old_cols:
+            return
+        new_rows = max(rows, old_rows * 2 if rows > old_rows else old_rows)
+        new_cols = max(cols, old_cols * 2 if cols > old_cols else old_cols)
+        grown = np.full((new_rows, new_cols), np.nan)
+        grown[:old_rows, :old_cols] = self._data
+        self._data = grown
+        
+    def _row(self, student_id: str) -> int:
+        row = self.student_index.get(student_id)
+        if row is None:
+            row = len(self.student_ids)
+            self._grow(row + 1, len(self.assessment_ids))
+            self.student_index[student_id] = row
+            self.student_ids.append(student_id)
+        return row
+        
+    def _column(self, assessment_id: str) -> int:
+        col = self.assessment_index.get(assessment_id)
+        if col is None:
+            col = len(self.assessment_ids)
+            self._grow(len(self.student_ids), col + 1)
+            self.assessment_index[assessment_id] = col
+            self.assessment_ids.append(assessment_id)
+        return col
+        
+    def set_score(self, student_id: str, assessment_id: str, score: float):
+        """Record one student's score on one assessment."""
+        self._data[self._row(student_id), self._column(assessment_id)] = score
+        
+    def bulk_ingest(self, records: Iterable[Tuple[str, str, float]]) -> int:
+        """
+        Load many (student_id, assessment_id, score) records at once.
+        
+        IDs are resolved to rows and columns first, then all the scores are
+        written into the array in a single scatter. Returns how many records
+        were loaded.
+        """
+        rows, cols, values = [], [], []
+        for student_id, assessment_id, score in records:
+            rows.append(self._row(student_id))
+            cols.append(self._column(assessment_id))
+            values.append(score)
+        if values:
+            self._data[np.asarray(rows), np.asarray(cols)] = np.asarray(values, dtype=float)
+        return len(values)
+        
+    def ingest_block(self, student_ids: List[str], assessment_ids: List[str], block) -> int:
+        """Load a whole 2D block of scores (one row per student, NaN for missing)."""
+        block = np.asarray(block, dtype=float)
+        rows = np.fromiter((self._row(s) for s in student_ids), dtype=np.intp, count=len(student_ids))
+        cols = np.fromiter((self._column(a) for a in assessment_ids), dtype=np.intp, count=len(assessment_ids))
+        self._data[np.ix_(rows, cols)] = block
+        return block.size
+        
+    def assessment_means(self) -> "np.ndarray":
+        """Mean score of each assessment, ignoring students who didn't sit it."""
+        with np.errstate(invalid='ignore'):
+            return np.nanmean(self.scores, axis=0)
+            
+    def assessment_stds(self) -> "np.ndarray":
+        """Standard deviation of each assessment, ignoring missing scores."""
+        with np.errstate(invalid='ignore'):
+            return np.nanstd(self.scores, axis=0)
+            
+    def student_averages(self, weights: Optional[Dict[str, float]] = None) -> "np.ndarray":
+        """
+        Each student's (optionally weighted) average over the assessments they sat.
+        
+        weights maps assessment_id to its weight; assessments not mentioned get
+        weight 1. Missing scores are left out of both the total and the weights.
+        """
+        data = self.scores
+        weight_row = np.ones(data.shape[1])
+        for assessment_id, weight in (weights or {}).items():
+            col = self.assessment_index.get(assessment_id)
+            if col is not None:
+                weight_row[col] = weight
+        present = ~np.isnan(data)
+        totals = np.where(present, data, 0.0) @ weight_row
+        weight_sums = present @ weight_row
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return totals / weight_sums
+            
+    def z_scores(self) -> "np.ndarray":
+        """How many standard deviations each score is from its assessment's mean."""
+        means = self.assessment_means()
+        stds = self.assessment_stds()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return (self.scores - means) / np.where(stds > 0, stds, np.nan)
+            
+            
 class PerformanceAnalytics:
     """
     Analyzes student performance using a max-heap to quickly find top performers.
     
     The heap keeps the highest-scoring students readily accessible at the top,
     making it easy to identify and reward academic excellence.
+    
+    Alongside the heap we keep every student's (-average, student_id) key in a
+    sorted list. Inserting costs one binary search plus a memory shift, and in
+    return top-k, rank and percentile queries never have to copy the heap.
+    
+    When a student is re-graded or removed their old heap entry is not dug out;
+    it is just marked stale and skipped (lazy deletion). Once stale entries
+    outnumber live ones the heap is rebuilt, so it never grows much past the
+    number of students.
     """
     
-    def __init__(self):
-        # We store negative scores to simulate a max-heap using Python's min-heap
+    def __init__(self, output: Optional[OutputSink] = None):
+        # Messages go here; by default they are dropped without being formatted
+        self.output = output or NullSink()
+        # We store negative scores to simulate a max-heap using Python's min-heap.
+        # Entries are (-average, student_id, entry_id).
         self.heap = []
         self.student_scores = {}
+        # Same keys as the heap, but fully sorted (best student first)
+        self._ranking = []
+        # The entry_id of each student's current heap entry; anything else is stale
+        self._live_entries = {}
+        self._next_entry_id = 0
+        # Called as journal(operation, *args) after every change, e.g. by SchoolStore
+        self.journal = None
+        
+    def _ranking_key(self, student_id: str) -> Tuple[float, str]:
+        return (-self.student_scores[student_id]['average'], student_id)
         
-    def add_performance_record(self, student_id: str, scores_list: List[float]):
-        """Add a student's performance data to our analytics."""
+    def _store_record(self, student_id: str, scores_list: List[float]) -> float:
+        """Put a student's scores into the heap, rankings and detail records."""
         average_score = sum(scores_list) / len(scores_list)
         
+        # A student only gets one spot in the rankings
+        if student_id in self.student_scores:
+            self._drop_record(student_id)
+            
         # Store in heap (using negative for max heap with heapq)
-        heapq.heappush(self.heap, (-average_score, student_id))
+        entry_id = self._next_entry_id
+        self._next_entry_id += 1
+        heapq.heappush(self.heap, (-average_score, student_id, entry_id))
+        self._live_entries[student_id] = entry_id
+        bisect.insort(self._ranking, (-average_score, student_id))
         
         # Keep detailed records for reporting
         self.student_scores[student_id] = {
             'scores': scores_list,
             'average': average_score
         }
-        print(f"Performance record added for student {student_id} with average {average_score:.2f}")
+        if self.journal:
+            self.journal('save_scores', student_id, scores_list, average_score)
+        return average_score
         
-    def display_top_performer(self, k: int = 1):
-        """Show the top performing students."""
+    def _drop_record(self, student_id: str):
+        """Forget a student's scores; their heap entry goes stale."""
+        old_key = self._ranking_key(student_id)
+        del self._ranking[bisect.bisect_left(self._ranking, old_key)]
+        del self._live_entries[student_id]
+        del self.student_scores[student_id]
+        if self.journal:
+            self.journal('delete_scores', student_id)
+        self._compact_heap_if_needed()
+        
+    def _is_live(self, entry: Tuple[float, str, int]) -> bool:
+        return self._live_entries.get(entry[1]) == entry[2]
+        
+    def _compact_heap_if_needed(self):
+        """Rebuild the heap without stale entries once they make up half of it."""
+        if len(self.heap) > 2 * len(self._live_entries) + 16:
+            self.heap = [entry for entry in self.heap if self._is_live(entry)]
+            heapq.heapify(self.heap)
+            
+    def add_performance_record(self, student_id: str, scores_list: List[float]) -> float:
+        """Add a student's performance data to our analytics; returns their average."""
+        average_score = self._store_record(student_id, scores_list)
+        self.output.emit('performance_added',
+                         "Performance record added for student {student_id} "
+                         "with average {average:.2f}",
+                         student_id=student_id, average=average_score)
+        return average_score
+        
+    def update_performance_record(self, student_id: str, scores_list: List[float]) -> bool:
+        """Replace a student's scores after a re-grade."""
+        if student_id not in self.student_scores:
+            self.output.emit('performance_not_found', "Performance record not found!",
+                             student_id=student_id)
+            return False
+        average_score = self._store_record(student_id, scores_list)
+        self.output.emit('performance_updated',
+                         "Performance record updated for student {student_id} "
+                         "with average {average:.2f}",
+                         student_id=student_id, average=average_score)
+        return True
+        
+    def remove_performance_record(self, student_id: str) -> bool:
+        """Take a student out of the analytics."""
+        if student_id not in self.student_scores:
+            self.output.emit('performance_not_found', "Performance record not found!",
+                             student_id=student_id)
+            return False
+        self._drop_record(student_id)
+        self.output.emit('performance_removed', "Performance record removed for student {student_id}",
+                         student_id=student_id)
+        return True
+        
+    def top_performer(self) -> Optional[Tuple[str, float]]:
+        """Peek at the best student via the heap, clearing stale entries off the top."""
+        while self.heap and not self._is_live(self.heap[0]):
+            heapq.heappop(self.heap)
         if not self.heap:
-            print("No performance records available.")
-            return
+            return None
+        neg_avg, student_id, _ = self.heap[0]
+        return student_id, -neg_avg
+        
+    def bulk_load(self, records: Iterable[Tuple[str, List[float]]]) -> Dict[str, int]:
+        """
+        Add many (student_id, scores_list) records without printing each one.
+        
+        Records with no (or non-numeric) scores are rejected; students who
+        already have a record (or appear twice in the batch) count as
+        duplicates. The heap and rankings are rebuilt once at the end rather
+        than per record.
+        Returns how many records were inserted, duplicated and rejected.
+        """
+        summary = {'inserted': 0, 'duplicates': 0, 'rejected': 0}
+        for student_id, scores_list in records:
+            if student_id in self.student_scores:
+                summary['duplicates'] += 1
+                continue
+            try:
+                average_score = sum(scores_list) / len(scores_list)
+            except (TypeError, ZeroDivisionError):
+                summary['rejected'] += 1
+                continue
+            if not student_id:
+                summary['rejected'] += 1
+                continue
+            self.student_scores[student_id] = {
+                'scores': scores_list,
+                'average': average_score
+            }
+            if self.journal:
+                self.journal('save_scores', student_id, scores_list, average_score)
+            summary['inserted'] += 1
+        if summary['inserted']:
+            self._rebuild_indexes()
+        return summary
+        
+    def load_score_matrix(self, matrix: ScoreMatrix,
+                          weights: Optional[Dict[str, float]] = None) -> int:
+        """
+        Take every student's average from a ScoreMatrix in one go.
+        
+        Averages are computed for the whole matrix at once, then the heap and
+        rankings are rebuilt a single time instead of once per student.
+        Students with no scores at all are skipped. Returns how many were loaded.
+        """
+        averages = matrix.student_averages(weights)
+        data = matrix.scores
+        loaded = 0
+        for row, student_id in enumerate(matrix.student_ids):
+            average_score = float(averages[row])
+            if average_score != average_score:  # NaN: nothing to average
+                continue
+            row_scores = data[row]
+            scores_list = row_scores[~np.isnan(row_scores)].tolist()
+            self.student_scores[student_id] = {
+                'scores': scores_list,
+                'average': average_score
+            }
+            if self.journal:
+                self.journal('save_scores', student_id, scores_list, average_score)
+            loaded += 1
+        self._rebuild_indexes()
+        self.output.emit('performance_loaded', "Performance records loaded for {loaded} students",
+                         loaded=loaded)
+        return loaded
+        
+    def _rebuild_indexes(self):
+        """Rebuild the heap and rankings from student_scores in one pass."""
+        self._ranking = sorted((-info['average'], student_id)
+                               for student_id, info in self.student_scores.items())
+        self._live_entries = {}
+        self.heap = []
+        for neg_avg, student_id in self._ranking:
+            self.heap.append((neg_avg, student_id, self._next_entry_id))
+            self._live_entries[student_id] = self._next_entry_id
+            self._next_entry_id += 1
+        # A sorted list is already a valid heap, but keep heapq's invariant explicit
+        heapq.heapify(self.heap)
+        
+    def top_k(self, k: int = 1) -> List[Tuple[str, float]]:
+        """The k best students as (student_id, average), best first."""
+        return [(student_id, -neg_avg) for neg_avg, student_id in self._ranking[:max(k, 0)]]
+        
+    def rank_of(self, student_id: str) -> Optional[int]:
+        """A student's position in the rankings (1 is the top), or None if unknown."""
+        if student_id not in self.student_scores:
+            return None
+        return bisect.bisect_left(self._ranking, self._ranking_key(student_id)) + 1
+        
+    def percentile(self, student_id: str) -> Optional[float]:
+        """Percentage of students ranked at or below this student (top student is 100)."""
+        rank = self.rank_of(student_id)
+        if rank is None:
+            return None
+        total = len(self._ranking)
+        return 100.0 * (total - rank + 1) / total
+        
+    def rankings_report(self, k: Optional[int] = None, page_size: int = 50) -> Report:
+        """
+        Students from best to worst (only the first k if given), formatted on
+        demand. The title matches display_top_performer when k is given and
+        view_all_rankings otherwise.
+        """
+        def rows():
+            ranking = enumerate(self._ranking, 1)
+            return ranking if k is None else itertools.islice(ranking, max(k, 0))
             
-        print(f"\n=== TOP {k} PERFORMER(S) ===")
-        # Work with a copy to avoid modifying our main heap
-        temp_heap = self.heap.copy()
+        def fields(row):
+            position, (neg_avg, student_id) = row
+            return {'rank': position, 'student_id': student_id, 'average': -neg_avg,
+                    'scores': self.student_scores[student_id]['scores']}
+                    
+        title = "ALL RANKINGS (Highest to Lowest)" if k is None else f"TOP {k} PERFORMER(S)"
+        return Report('rankings', title, rows, fields,
+                      "{rank}. Student {student_id}: Average = {average:.2f}, Scores = {scores}",
+                      "No performance records available.", page_size)
+                      
+    def display_top_performer(self, k: int = 1) -> Report:
+        """Show the top performing students."""
+        report = self.rankings_report(k)
+        report.show(self.output)
+        return report
         
-        for i in range(min(k, len(temp_heap))):
-            if not temp_heap:
-                break
-            neg_avg, student_id = heapq.heappop(temp_heap)
-            avg_score = -neg_avg
-            details = self.student_scores[student_id]
-            print(f"{i+1}. Student {student_id}: Average = {avg_score:.2f}, "
-                  f"Scores = {details['scores']}")
-                  
-    def view_all_rankings(self):
+    def view_all_rankings(self, page: Optional[int] = None, page_size: int = 50) -> Report:
         """Show all students ranked from highest to lowest performance."""
-        if not self.heap:
-            print("No performance records available.")
-            return
+        report = self.rankings_report(page_size=page_size)
+        report.show(self.output, page)
+        return report
+
+
+class SchoolStore:
+    """
+    Saves every module's data to a SQLite database so nothing is lost on exit.
+    
+    Each module reports its changes through its journal hook and every change
+    becomes a write to a single row (one student, one payment, one loan), so
+    updating a payment never rewrites the whole database. Writes are grouped
+    into transactions of commit_every changes; commit() or close() flushes
+    whatever is left.
+    
+    Modules are loaded one at a time (load_module), each with a single query
+    per table whose rows go to the module's quiet bulk loader. SchoolManager
+    only loads a module the first time it is used, so opening a big school
+    costs next to nothing until someone touches its data.
+    """
+    
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS students (
+            student_id TEXT PRIMARY KEY, name TEXT, course_id TEXT, extra TEXT);
+        CREATE TABLE IF NOT EXISTS courses (
+            course_id TEXT PRIMARY KEY, capacity INTEGER);
+        CREATE TABLE IF NOT EXISTS course_meetings (
+            course_id TEXT, day INTEGER, start_minute INTEGER, end_minute INTEGER);
+        CREATE TABLE IF NOT EXISTS enrolments (
+            course_id TEXT, student_id TEXT, PRIMARY KEY (course_id, student_id));
+        CREATE TABLE IF NOT EXISTS waitlists (
+            course_id TEXT, student_id TEXT, seniority INTEGER, arrival INTEGER,
+            PRIMARY KEY (course_id, student_id));
+        CREATE TABLE IF NOT EXISTS payments (
+            student_id TEXT PRIMARY KEY, amount_paid REAL, total_fee REAL);
+        CREATE TABLE IF NOT EXISTS books (
+            isbn TEXT PRIMARY KEY, title TEXT, total_copies INTEGER);
+        CREATE TABLE IF NOT EXISTS loans (
+            isbn TEXT, student_id TEXT, borrowed_at REAL, due_at REAL);
+        CREATE INDEX IF NOT EXISTS loans_by_book ON loans (isbn, student_id);
+        CREATE TABLE IF NOT EXISTS scores (
+            student_id TEXT PRIMARY KEY, scores TEXT, average REAL);
+    """
+    
+    # One statement per journal operation
+    _WRITES = {
+        'save_student': "INSERT OR REPLACE INTO students VALUES (?, ?, ?, ?)",
+        'delete_student': "DELETE FROM students WHERE student_id = ?",
+        'enrol': "INSERT OR IGNORE INTO enrolments VALUES (?, ?)",
+        'drop': "DELETE FROM enrolments WHERE course_id = ? AND student_id = ?",
+        'waitlist': "INSERT OR REPLACE INTO waitlists VALUES (?, ?, ?, ?)",
+        'unwaitlist': "DELETE FROM waitlists WHERE course_id = ? AND student_id = ?",
+        'save_payment': "INSERT OR REPLACE INTO payments VALUES (?, ?, ?)",
+        'delete_payment': "DELETE FROM payments WHERE student_id = ?",
+        'save_book': "INSERT OR REPLACE INTO books VALUES (?, ?, ?)",
+        'add_loan': "INSERT INTO loans VALUES (?, ?, ?, ?)",
+        'remove_loan': "DELETE FROM loans WHERE rowid = (SELECT rowid FROM loans "
+                       "WHERE isbn = ? AND student_id = ? LIMIT 1)",
+        'save_scores': "INSERT OR REPLACE INTO scores VALUES (?, ?, ?)",
+        'delete_scores': "DELETE FROM scores WHERE student_id = ?",
+    }
+    
+    def __init__(self, path: str, commit_every: int = 1000):
+        self.path = path
+        self.commit_every = commit_every
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets a commit append to the log instead of rewriting pages in place
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self._SCHEMA)
+        # Databases from before students had extra fields lack the column
+        if 'extra' not in [row[1] for row in self.conn.execute("PRAGMA table_info(students)")]:
+            self.conn.execute("ALTER TABLE students ADD COLUMN extra TEXT")
+        # Course capacities are saved on commit once the scheduler is loaded
+        self._scheduler = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        
+    def record(self, operation: str, *args):
+        """Write one change reported by a module's journal hook."""
+        if operation == 'save_scores':
+            student_id, scores_list, average_score = args
+            args = (student_id, json.dumps(scores_list), average_score)
+        elif operation == 'save_student':
+            # Fields beyond name and course_id go in one JSON column (NULL if none)
+            student_id, name, course_id, extra = args
+            args = (student_id, name, course_id,
+                    json.dumps(extra, default=_to_json) if extra else None)
+        with self._lock:
+            self.conn.execute(self._WRITES[operation], args)
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self.conn.commit()
+                self._pending = 0
+                
+    def load_module(self, name: str, module: Any):
+        """
+        Fill a freshly created module from the database and start recording
+        its changes. name is the SchoolManager attribute, e.g. 'fee_tracking'.
+        """
+        # Loading creates a lot of objects and nothing cyclic, so the cyclic
+        # garbage collector would only slow it down
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._load_rows(name, module)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        module.journal = self.record
+        
+    def _load_rows(self, name: str, module: Any):
+        conn = self.conn
+        if name == 'student_registry':
+            module.bulk_load(conn.execute("SELECT student_id, name, course_id FROM students"))
+            students = module.students
+            for student_id, extra in conn.execute(
+                    "SELECT student_id, extra FROM students WHERE extra IS NOT NULL"):
+                students[student_id]._apply(json.loads(extra))
+            
+        elif name == 'course_scheduler':
+            module.load_course_capacity(conn.execute("SELECT course_id, capacity FROM courses"))
+            module.load_course_meetings(conn.execute(
+                "SELECT course_id, day, start_minute, end_minute FROM course_meetings"))
+            # Saved seats are kept even in a course that has shrunk since
+            module.bulk_load(
+                conn.execute("SELECT student_id, course_id FROM enrolments ORDER BY rowid"),
+                check_capacity=False)
+            module._load_waitlist(conn.execute(
+                "SELECT course_id, student_id, seniority, arrival FROM waitlists"))
+            self._scheduler = module
+            
+        elif name == 'fee_tracking':
+            # Rows come back sorted by the primary key, ready for the balanced build
+            module.bulk_load(conn.execute(
+                "SELECT student_id, amount_paid, total_fee FROM payments ORDER BY student_id"))
             
-        print("\n=== ALL RANKINGS (Highest to Lowest) ===")
-        # Sort all records by performance
-        sorted_records = []
-        temp_heap = self.heap.copy()
+        elif name == 'library_system':
+            module.bulk_load(conn.execute("SELECT isbn, title, total_copies FROM books"))
+            for isbn, student_id, borrowed_at, due_at in conn.execute(
+                    "SELECT isbn, student_id, borrowed_at, due_at FROM loans ORDER BY rowid"):
+                module._lend(isbn, student_id, borrowed_at, due_at)
+                
+        elif name == 'performance_analytics':
+            rows = conn.execute("SELECT student_id, scores, average FROM scores").fetchall()
+            # Decoding every score list in one json.loads call is far cheaper
+            # than calling it once per student
+            all_scores = json.loads("[" + ",".join(row[1] for row in rows) + "]")
+            for (student_id, _, average_score), scores_list in zip(rows, all_scores):
+                module.student_scores[student_id] = {
+                    'scores': scores_list,
+                    'average': average_score
+                }
+            module._rebuild_indexes()
         
-        while temp_heap:
-            neg_avg, student_id = heapq.heappop(temp_heap)
-            avg_score = -neg_avg
-            sorted_records.append((student_id, avg_score))
+    def commit(self):
+        """Flush pending changes (and the current course capacities and times) to disk."""
+        with self._lock:
+            if self._scheduler is not None:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO courses VALUES (?, ?)",
+                    self._scheduler.course_capacity.items())
+                self.conn.execute("DELETE FROM course_meetings")
+                self.conn.executemany(
+                    "INSERT INTO course_meetings VALUES (?, ?, ?, ?)",
+                    ((course_id, *meeting) for course_id, meetings
+                     in self._scheduler.course_meetings.items() for meeting in meetings))
+            self.conn.commit()
+            self._pending = 0
             
-        for i, (student_id, avg_score) in enumerate(sorted_records):
-            details = self.student_scores[student_id]
-            print(f"{i+1}. Student {student_id}: Average = {avg_score:.2f}, "
-                  f"Scores = {details['scores']}")
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+
+def _write_report_cards(rows: List[tuple], ranked: int, out: TextIO) -> int:
+    """
+    Render report cards from snapshot rows (see SchoolManager._report_snapshot)
+    to a text stream, one card at a time. Returns how many were written.
+    """
+    count = 0
+    for (student_id, name, programme, courses, amount_paid, total_fee, balance,
+         scores, average, rank) in rows:
+        lines = [f"=== REPORT CARD: {student_id} ===",
+                 f"Name: {name}",
+                 f"Programme: {programme}",
+                 f"Courses: {', '.join(courses) if courses else 'none'}"]
+        if total_fee is None:
+            lines.append("Fees: no payment record")
+        else:
+            lines.append(f"Fees: paid ${amount_paid} of ${total_fee}, balance ${balance} "
+                         f"({'Cleared' if balance <= 0 else 'Pending'})")
+        if scores is None:
+            lines.append("Performance: no scores recorded")
+        else:
+            lines.append(f"Performance: average {average:.2f}, rank {rank} of {ranked}")
+            lines.append(f"Scores: {', '.join(f'{score:g}' for score in scores)}")
+        out.write("\n".join(lines) + "\n\n")
+        count += 1
+    return count
+
+
+def _write_report_shard(rows: List[tuple], ranked: int, path: str) -> int:
+    """Process pool entry point: render one shard of report cards to its own file."""
+    with open(path, "w", encoding="utf-8") as out:
+        return _write_report_cards(rows, ranked, out)
 
 
 class SchoolManager:
@@ -380,14 +2829,399 @@ class SchoolManager:
     
     This class serves as the central hub, connecting all the different parts
     of our school system and providing a unified interface for users.
+    
+    Give it a database path and everything is loaded from (and saved to) a
+    SchoolStore; without one the data only lives in memory. With a store each
+    module is only read from disk the first time it is used.
+    
+    With metrics=True (or after enable_metrics()) every public method of the
+    five modules is timed into a Metrics object; see metrics() and
+    prometheus_metrics(). While disabled the modules run untouched.
     """
     
-    def __init__(self):
-        self.student_registry = StudentRegistry()
-        self.course_scheduler = CourseScheduler()
-        self.fee_tracking = FeeTracking()
-        self.library_system = LibrarySystem()
-        self.performance_analytics = PerformanceAnalytics()
+    # Attribute name -> module class for each of the five modules
+    MODULES = {
+        'student_registry': StudentRegistry,
+        'course_scheduler': CourseScheduler,
+        'fee_tracking': FeeTracking,
+        'library_system': LibrarySystem,
+        'performance_analytics': PerformanceAnalytics,
+    }
+    
+    def __init__(self, db_path: Optional[str] = None, output: Optional[OutputSink] = None,
+                 metrics: bool = False):
+        # The menus are for people at a terminal, so messages are printed by default
+        self.output = output or ConsoleSink()
+        # The Metrics being recorded into, or None while instrumentation is off
+        self._metrics = None
+        self.store = SchoolStore(db_path) if db_path else None
+        self._load_lock = threading.Lock()
+        # Held while a cross-module batch runs so nobody sees it half applied
+        self._batch_lock = threading.RLock()
+        if self.store is None:
+            for name, module_class in self.MODULES.items():
+                setattr(self, name, module_class(output=self.output))
+        if metrics:
+            self.enable_metrics()
+                
+    def __getattr__(self, name: str):
+        # Only reached when a module hasn't been loaded from the store yet
+        module_class = self.MODULES.get(name)
+        if module_class is None or self.__dict__.get('store') is None:
+            raise AttributeError(name)
+        with self._load_lock:
+            # Another thread may have loaded it while we waited
+            if name not in self.__dict__:
+                module = module_class(output=self.output)
+                self.store.load_module(name, module)
+                if self._metrics is not None:
+                    self._instrument(name, module, self._metrics)
+                setattr(self, name, module)
+        return self.__dict__[name]
+        
+    # --- Instrumentation ---
+    
+    @staticmethod
+    def _public_methods(module_class: type) -> List[str]:
+        return [name for name, attr in vars(module_class).items()
+                if not name.startswith('_') and callable(attr) and not isinstance(attr, type)]
+                
+    def _instrument(self, name: str, module: Any, metrics: Optional[Metrics]):
+        """Shadow (or, with metrics=None, unshadow) a module's public methods with timed ones."""
+        for method_name in self._public_methods(type(module)):
+            if metrics is None:
+                module.__dict__.pop(method_name, None)
+            else:
+                method = vars(type(module))[method_name].__get__(module, type(module))
+                setattr(module, method_name, metrics.wrap(name, method))
+                
+    def enable_metrics(self, metrics: Optional[Metrics] = None) -> Metrics:
+        """
+        Start timing every public module method, into metrics or a fresh Metrics.
+        
+        The timed versions are set on the module instances, so turning metrics
+        off again just removes them. Modules not yet loaded from the store are
+        instrumented when they are. A call made from inside another public
+        method is counted as an operation of its own as well.
+        """
+        with self._load_lock:
+            self._metrics = metrics = metrics or self._metrics or Metrics()
+            for name in self.MODULES:
+                if name in self.__dict__:
+                    self._instrument(name, self.__dict__[name], metrics)
+        return metrics
+        
+    def disable_metrics(self) -> Optional[Metrics]:
+        """Stop timing; returns the Metrics recorded so far (None if it wasn't on)."""
+        with self._load_lock:
+            for name in self.MODULES:
+                if name in self.__dict__:
+                    self._instrument(name, self.__dict__[name], None)
+            metrics, self._metrics = self._metrics, None
+        return metrics
+            
+    def _gauges(self) -> Dict[str, Dict[str, float]]:
+        """Current sizes of the modules' structures; modules not loaded yet are left out."""
+        modules = self.__dict__
+        gauges = {}
+        if 'student_registry' in modules:
+            gauges['student_registry'] = {'students': len(modules['student_registry'].students)}
+        if 'course_scheduler' in modules:
+            scheduler = modules['course_scheduler']
+            gauges['course_scheduler'] = {
+                'registration_queue_length': len(scheduler.registration_queue),
+                'students_enrolled': len(scheduler.student_courses),
+                'waitlisted': sum(map(len, list(scheduler._waitlisted.values()))),
+                'waitlist_heap_entries': sum(map(len, list(scheduler.waitlists.values()))),
+            }
+        if 'fee_tracking' in modules:
+            fees = modules['fee_tracking']
+            root = fees.root
+            gauges['fee_tracking'] = {
+                'records': root.subtree_size if root else 0,
+                'tree_height': fees._height(root),
+                'pending': root.subtree_pending if root else 0,
+            }
+        if 'library_system' in modules:
+            library = modules['library_system']
+            gauges['library_system'] = {
+                'books': len(library.books),
+                'loans_outstanding': len(library.loans),
+                'loans_overdue': len(library.overdue),
+                'due_heap_entries': len(library._due_heap),
+            }
+        if 'performance_analytics' in modules:
+            analytics = modules['performance_analytics']
+            gauges['performance_analytics'] = {
+                'students': len(analytics.student_scores),
+                'heap_entries': len(analytics.heap),
+            }
+        return gauges
+        
+    def metrics(self) -> Dict[str, Any]:
+        """
+        A snapshot of what the system is doing: whether instrumentation is on,
+        per-operation counts and latency histograms (see Metrics.snapshot)
+        and structural gauges per loaded module. Gauges are always filled in;
+        operations only while metrics are enabled.
+        """
+        metrics = self._metrics
+        return {
+            'enabled': metrics is not None,
+            'operations': metrics.snapshot() if metrics is not None else {},
+            'gauges': self._gauges(),
+        }
+        
+    def prometheus_metrics(self) -> str:
+        """metrics() in the Prometheus text exposition format."""
+        snapshot = self.metrics()
+        lines = []
+        if snapshot['operations']:
+            lines += ["# HELP school_operation_seconds Time spent in each module operation.",
+                      "# TYPE school_operation_seconds histogram"]
+            for module, operations in snapshot['operations'].items():
+                for operation, stats in operations.items():
+                    labels = f'module="{module}",operation="{operation}"'
+                    for bound, count in stats['buckets'].items():
+                        lines.append(f'school_operation_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f"school_operation_seconds_sum{{{labels}}} {stats['total_seconds']!r}")
+                    lines.append(f"school_operation_seconds_count{{{labels}}} {stats['calls']}")
+            lines += ["# HELP school_operation_errors_total Module operations that raised.",
+                      "# TYPE school_operation_errors_total counter"]
+            for module, operations in snapshot['operations'].items():
+                for operation, stats in operations.items():
+                    lines.append(f'school_operation_errors_total{{module="{module}",operation="{operation}"}} '
+                                 f"{stats['errors']}")
+        for module, gauges in snapshot['gauges'].items():
+            for gauge, value in gauges.items():
+                metric = f"school_{module}_{gauge}"
+                lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+        
+
+    def close(self):
+        """Save any pending changes and release the database."""
+        if self.store:
+            self.store.close()
+            self.store = None
+            
+    def student_profile(self, student_id: str) -> Optional[Dict]:
+        """
+        Everything the five modules know about one student, or None if none of
+        them have heard of the student.
+        
+        Each module is asked through its own per-student index, so this costs
+        one lookup per module no matter how many records the school holds.
+        """
+        registry_record = self.student_registry.students.get(student_id)
+        payment_node = self.fee_tracking._search_node(student_id)
+        analytics = self.performance_analytics
+        scores = analytics.student_scores.get(student_id)
+        profile = {
+            'student_id': student_id,
+            'info': dict(registry_record) if registry_record is not None else None,
+            'courses': self.course_scheduler.courses_for_student(student_id),
+            'waitlists': self.course_scheduler.waitlist_entries(student_id),
+            'payment': dict(PaymentRecord(payment_node)) if payment_node else None,
+            'loans': self.library_system.loans_for_student(student_id),
+            'performance': None,
+        }
+        if scores is not None:
+            profile['performance'] = {
+                'scores': list(scores['scores']),
+                'average': scores['average'],
+                'rank': analytics.rank_of(student_id),
+            }
+        if (registry_record is None and payment_node is None and scores is None
+                and not profile['courses'] and not profile['waitlists'] and not profile['loans']):
+            return None
+        return profile
+        
+    def offboard_students(self, student_ids: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Remove students from all five modules at once.
+        
+        Registry entries, course seats, payment records, open loans and
+        performance records are all removed, so nothing is left orphaned.
+        Each student costs one indexed lookup per module. The batch is all
+        or nothing: if anything fails part way, every student already
+        processed is put back (seats, waitlist places and all) before the
+        error is raised. Freed seats only go to waitlisted students once the
+        whole batch has succeeded, so there are no promotions to undo. If
+        something can't be put back (a copy another thread borrowed in the
+        meantime), a RuntimeError naming it is raised from the original
+        error. Returns which students were offboarded and which weren't
+        found anywhere.
+        """
+        result = {'offboarded': [], 'not_found': []}
+        with self._batch_lock:
+            # Capture everything first so a failure can be undone
+            profiles = []
+            for student_id in dict.fromkeys(student_ids):
+                profile = self.student_profile(student_id)
+                if profile is None:
+                    result['not_found'].append(student_id)
+                else:
+                    profiles.append((profile, self.student_registry.students.get(student_id)))
+                    
+            done = []
+            try:
+                for profile, registry_record in profiles:
+                    done.append((profile, registry_record))
+                    self._remove_everywhere(profile['student_id'])
+            except Exception as error:
+                unrestored = []
+                for profile, registry_record in reversed(done):
+                    unrestored += self._restore_everywhere(profile, registry_record)
+                if unrestored:
+                    raise RuntimeError("offboarding failed and could not be fully undone: "
+                                       + "; ".join(unrestored)) from error
+                raise
+            self.course_scheduler._fill_seats(sorted({course_id for profile, _ in profiles
+                                                      for course_id in profile['courses']}))
+                
+        result['offboarded'] = [profile['student_id'] for profile, _ in profiles]
+        self.output.emit('students_offboarded',
+                         "Offboarded {offboarded} student(s); {not_found} not found.",
+                         offboarded=len(result['offboarded']), not_found=len(result['not_found']))
+        return result
+        
+    def _remove_everywhere(self, student_id: str):
+        self.student_registry._remove(student_id)
+        # Seats are handed on by offboard_students once the whole batch is through
+        self.course_scheduler._withdraw(student_id, promote=False)
+        self.fee_tracking._delete(student_id)
+        self.library_system._release_loans(student_id)
+        if student_id in self.performance_analytics.student_scores:
+            self.performance_analytics._drop_record(student_id)
+            
+    def _restore_everywhere(self, profile: Dict, registry_record: Optional[StudentRecord]) -> List[str]:
+        """
+        Undo a (possibly partial) _remove_everywhere from a captured profile.
+        
+        Other threads (process_queue_concurrent, say) don't take the batch
+        lock, so they may have used a freed seat or copy in the meantime.
+        Seats are put back even over capacity, since the student never really
+        gave theirs up; anything that still can't be restored is returned as
+        a description rather than skipped silently.
+        """
+        student_id = profile['student_id']
+        unrestored = []
+        if registry_record is not None and student_id not in self.student_registry.students:
+            self.student_registry._restore(student_id, registry_record)
+        scheduler = self.course_scheduler
+        for course_id in profile['courses']:
+            outcome = scheduler._try_enrol(student_id, course_id, waitlist=False,
+                                           check_times=False, check_capacity=False)
+            if outcome not in ('enrolled', 'duplicate'):
+                unrestored.append(f"{student_id} seat in {course_id} ({outcome})")
+        for entry in profile['waitlists']:
+            scheduler._rejoin_waitlist(student_id, entry['course_id'], entry['seniority'], entry['arrival'])
+        payment = profile['payment']
+        if payment and self.fee_tracking._search_node(student_id) is None:
+            self.fee_tracking._insert(student_id, payment['amount_paid'], payment['total_fee'])
+        open_loans = {loan['loan_id'] for loan in
+                      self.library_system.loans_for_student(student_id)}
+        for loan in profile['loans']:
+            if loan['loan_id'] not in open_loans:
+                outcome = self.library_system._lend(loan['isbn'], student_id,
+                                                    loan['borrowed_at'], loan['due_at'])
+                if outcome != 'borrowed':
+                    unrestored.append(f"{student_id} loan of {loan['isbn']} ({outcome})")
+        performance = profile['performance']
+        if performance and student_id not in self.performance_analytics.student_scores:
+            self.performance_analytics._store_record(student_id, performance['scores'])
+        return unrestored
+        
+    def _report_snapshot(self, student_ids: Optional[Iterable[str]] = None) -> List[tuple]:
+        """
+        Everything a report card needs, as plain tuples in student ID order.
+        
+        Rows are (student_id, name, programme, courses, amount_paid,
+        total_fee, balance, scores, average, rank), with None where a module
+        has nothing on the student. Tuples of strings and numbers pickle
+        small and fast, unlike the live modules with their trees and locks.
+        
+        For the whole school, payments and ranks are read in one in-order
+        pass each instead of a tree search and a binary search per student.
+        """
+        registry = self.student_registry
+        scheduler = self.course_scheduler
+        fees = self.fee_tracking
+        analytics = self.performance_analytics
+        rows = []
+        with self._batch_lock:
+            if student_ids is None:
+                student_ids = registry.students
+                nodes = {node.student_id: node for node in fees.iter_nodes()}
+                find_node = nodes.get
+                ranks = {student_id: rank for rank, (_, student_id)
+                         in enumerate(analytics._ranking, 1)}
+                rank_of = ranks.get
+            else:
+                find_node = fees._search_node
+                rank_of = analytics.rank_of
+            for student_id in sorted(student_ids):
+                info = registry.students.get(student_id)
+                node = find_node(student_id)
+                scores = analytics.student_scores.get(student_id)
+                rows.append((
+                    student_id,
+                    info['name'] if info else None,
+                    info['course_id'] if info else None,
+                    tuple(scheduler.courses_for_student(student_id)),
+                    node.amount_paid if node else None,
+                    node.total_fee if node else None,
+                    node.balance if node else None,
+                    tuple(scores['scores']) if scores else None,
+                    scores['average'] if scores else None,
+                    rank_of(student_id) if scores else None,
+                ))
+        return rows
+        
+    def generate_report_cards(self, out_path: str, student_ids: Optional[Iterable[str]] = None,
+                              workers: Optional[int] = None, shard_size: int = 2000) -> int:
+        """
+        Write a term-end report card for every student (or the given ones)
+        to out_path, in student ID order.
+        
+        A compact snapshot is taken first, then cut into shards of
+        shard_size students. Each shard is rendered by a worker process
+        (workers defaults to one per core) into its own part file. The parts
+        are appended to out_path in order as they finish, so neither the
+        workers nor this process hold the whole report in memory. With one
+        worker (asked for, or the only core there is) everything is rendered
+        here, without a pool. Returns how many report cards were written.
+        """
+        workers = workers or os.cpu_count() or 1
+        rows = self._report_snapshot(student_ids)
+        ranked = len(self.performance_analytics._ranking)
+        shards = [rows[i:i + shard_size] for i in range(0, len(rows), shard_size)]
+        
+        with open(out_path, "w", encoding="utf-8") as out:
+            if workers == 1 or len(shards) <= 1:
+                return _write_report_cards(rows, ranked, out)
+                
+            parts_dir = out_path + ".parts"
+            os.makedirs(parts_dir, exist_ok=True)
+            # Forked workers inherit this module even when it was loaded by file path
+            context = (multiprocessing.get_context('fork')
+                       if 'fork' in multiprocessing.get_all_start_methods() else None)
+            written = 0
+            try:
+                with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                    parts = [os.path.join(parts_dir, f"{i:06d}.txt") for i in range(len(shards))]
+                    futures = [pool.submit(_write_report_shard, shard, ranked, part)
+                               for shard, part in zip(shards, parts)]
+                    # Shards must land in order, so wait for each in turn
+                    for future, part in zip(futures, parts):
+                        written += future.result()
+                        with open(part, encoding="utf-8") as part_file:
+                            shutil.copyfileobj(part_file, out)
+                        os.remove(part)
+            finally:
+                shutil.rmtree(parts_dir, ignore_errors=True)
+        return written
         
     def display_menu(self):
         """Show the main navigation menu."""
@@ -453,9 +3287,12 @@ class SchoolManager:
             print("1. Enrol Student Request")
             print("2. Process Registration Queue")
             print("3. Display Course Allocations")
-            print("4. Back to Main Menu")
+            print("4. Drop Student from Course")
+            print("5. View Course Waitlist")
+            print("6. Timetable Conflicts Report")
+            print("7. Back to Main Menu")
             
-            choice = input("Enter choice (1-4): ")
+            choice = input("Enter choice (1-7): ")
             
             if choice == '1':
                 student_id = input("Enter Student ID: ")
@@ -469,6 +3306,22 @@ class SchoolManager:
                 self.course_scheduler.display_course_allocations()
                 
             elif choice == '4':
+                student_id = input("Enter Student ID: ")
+                course_id = input("Enter Course ID: ")
+                self.course_scheduler.drop_student(student_id, course_id)
+                
+            elif choice == '5':
+                course_id = input("Enter Course ID: ")
+                waiting = self.course_scheduler.waitlist_for(course_id)
+                if not waiting:
+                    print("Nobody is waiting for this course.")
+                for position, student_id in enumerate(waiting, 1):
+                    print(f"{position}. {student_id}")
+                    
+            elif choice == '6':
+                self.course_scheduler.display_conflicts()
+                
+            elif choice == '7':
                 break
             else:
                 print("Invalid choice!")
@@ -480,10 +3333,11 @@ class SchoolManager:
             print("1. Add Payment Record")
             print("2. Search Payment Record")
             print("3. Update Payment Record")
-            print("4. Generate Fee Clearance Report")
-            print("5. Back to Main Menu")
+            print("4. Record a Payment")
+            print("5. Generate Fee Clearance Report")
+            print("6. Back to Main Menu")
             
-            choice = input("Enter choice (1-5): ")
+            choice = input("Enter choice (1-6): ")
             
             if choice == '1':
                 student_id = input("Enter Student ID: ")
@@ -501,9 +3355,14 @@ class SchoolManager:
                 self.fee_tracking.update_payment_record(student_id, new_amount)
                 
             elif choice == '4':
-                self.fee_tracking.generate_fee_clearance_report()
+                student_id = input("Enter Student ID: ")
+                amount = float(input("Enter amount received: "))
+                self.fee_tracking.record_payment(student_id, amount)
                 
             elif choice == '5':
+                self.fee_tracking.generate_fee_clearance_report()
+                
+            elif choice == '6':
                 break
             else:
                 print("Invalid choice!")
@@ -516,9 +3375,10 @@ class SchoolManager:
             print("2. Borrow Book")
             print("3. Return Book")
             print("4. Check Availability")
-            print("5. Back to Main Menu")
+            print("5. Search Books by Title")
+            print("6. Back to Main Menu")
             
-            choice = input("Enter choice (1-5): ")
+            choice = input("Enter choice (1-6): ")
             
             if choice == '1':
                 isbn = input("Enter ISBN: ")
@@ -541,6 +3401,14 @@ class SchoolManager:
                 self.library_system.check_availability(isbn)
                 
             elif choice == '5':
+                query = input("Enter title words: ")
+                matches = self.library_system.search_books(query)
+                if not matches:
+                    print("No matching books.")
+                for isbn, title in matches:
+                    print(f"{isbn}: {title}")
+                    
+            elif choice == '6':
                 break
             else:
                 print("Invalid choice!")
@@ -552,9 +3420,11 @@ class SchoolManager:
             print("1. Add Performance Record")
             print("2. Display Top Performer")
             print("3. View All Rankings")
-            print("4. Back to Main Menu")
+            print("4. Update Performance Record")
+            print("5. Remove Performance Record")
+            print("6. Back to Main Menu")
             
-            choice = input("Enter choice (1-4): ")
+            choice = input("Enter choice (1-6): ")
             
             if choice == '1':
                 student_id = input("Enter Student ID: ")
@@ -571,6 +3441,16 @@ class SchoolManager:
                 self.performance_analytics.view_all_rankings()
                 
             elif choice == '4':
+                student_id = input("Enter Student ID: ")
+                scores = input("Enter new scores (comma-separated): ")
+                scores_list = [float(x.strip()) for x in scores.split(',')]
+                self.performance_analytics.update_performance_record(student_id, scores_list)
+                
+            elif choice == '5':
+                student_id = input("Enter Student ID to remove: ")
+                self.performance_analytics.remove_performance_record(student_id)
+                
+            elif choice == '6':
                 break
             else:
                 print("Invalid choice!")
@@ -656,13 +3536,415 @@ class SchoolManager:
             elif choice == '6':
                 self.run_demo_sequence()
             elif choice == '7':
+                self.close()
                 print("Thank you for using School Management System!")
                 break
             else:
                 print("Invalid choice! Please try again.")
 
 
+class SchoolServer:
+    """
+    A small JSON-over-HTTP front end to a SchoolManager, built on asyncio.
+    
+    Unlike the input() menus it can serve many clerks at once. Every request
+    is handled on the event loop thread using the modules' quiet methods, and
+    the answer is a JSON document rather than printed text.
+    
+    Handlers never await, so each one runs start to finish on the event loop
+    before the next request is looked at: a reader always sees the modules
+    as they were between two writes, and no locks are needed. For the same
+    reason nothing slow may happen inside a handler, so start() loads every
+    module from the store (in a worker thread) before accepting
+    connections, instead of the first request paying for it on the loop.
+    Connections are kept alive between requests (HTTP/1.1).
+    
+    GET /metrics answers in the Prometheus text format instead of JSON (or
+    with the metrics() snapshot for ?format=json). While the manager's
+    metrics are enabled every request is also timed, per handler.
+    """
+    
+    def __init__(self, manager: SchoolManager, host: str = "127.0.0.1", port: int = 8080):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self._server = None
+        # (method, compiled path, handler)
+        self._routes = [(method, re.compile(pattern), handler) for method, pattern, handler in (
+            ('GET', r"/students", self._find_students),
+            ('POST', r"/students", self._add_student),
+            ('POST', r"/students/offboard", self._offboard_students),
+            ('GET', r"/students/([^/]+)", self._get_student),
+            ('PATCH', r"/students/([^/]+)", self._update_student),
+            ('DELETE', r"/students/([^/]+)", self._delete_student),
+            ('GET', r"/students/([^/]+)/profile", self._student_profile),
+            ('GET', r"/courses/([^/]+)", self._get_course),
+            ('GET', r"/timetable-conflicts", self._timetable_conflicts),
+            ('POST', r"/enrolments", self._enrol),
+            ('DELETE', r"/enrolments/([^/]+)/([^/]+)", self._drop),
+            ('POST', r"/registration-queue", self._queue_request),
+            ('POST', r"/registration-queue/process", self._process_queue),
+            ('GET', r"/payments", self._list_payments),
+            ('POST', r"/payments", self._add_payment),
+            ('GET', r"/payments/totals", self._payment_totals),
+            ('GET', r"/payments/top-debtors", self._top_debtors),
+            ('GET', r"/payments/([^/]+)", self._get_payment),
+            ('PUT', r"/payments/([^/]+)", self._set_payment),
+            ('DELETE', r"/payments/([^/]+)", self._delete_payment),
+            ('POST', r"/payments/([^/]+)/transactions", self._record_payment),
+            ('GET', r"/books", self._search_books),
+            ('POST', r"/books", self._add_book),
+            ('GET', r"/books/([^/]+)", self._get_book),
+            ('GET', r"/loans", self._list_loans),
+            ('GET', r"/loans/overdue", self._overdue_loans),
+            ('POST', r"/loans", self._borrow),
+            ('POST', r"/returns", self._return),
+            ('GET', r"/performance/top", self._top_performers),
+            ('GET', r"/performance/([^/]+)", self._get_performance),
+            ('PUT', r"/performance/([^/]+)", self._set_performance),
+            ('DELETE', r"/performance/([^/]+)", self._delete_performance),
+            ('GET', r"/metrics", self._get_metrics),
+        )]
+        
+    # --- Student registry ---
+    
+    def _find_students(self, query: Dict, body: Any):
+        limit = int(query.get('limit', 100))
+        registry = self.manager.student_registry
+        if 'course' in query:
+            matches = registry.students_in_course(query['course'])
+        elif 'name_prefix' in query:
+            matches = registry.students_by_name_prefix(query['name_prefix'])
+        else:
+            matches = registry.students.items()
+        return 200, [dict(info, student_id=student_id)
+                     for student_id, info in itertools.islice(matches, limit)]
+                     
+    def _add_student(self, query: Dict, body: Any):
+        if not self.manager.student_registry._add(body['student_id'], body['name'], body['course_id']):
+            return 409, {'error': 'student already exists'}
+        return 201, {'student_id': body['student_id']}
+        
+    def _offboard_students(self, query: Dict, body: Any):
+        return 200, self.manager.offboard_students(body['student_ids'])
+            
+    def _get_student(self, query: Dict, body: Any, student_id: str):
+        info = self.manager.student_registry.students.get(student_id)
+        if info is None:
+            return 404, {'error': 'student not found'}
+        return 200, dict(info, student_id=student_id)
+        
+    def _update_student(self, query: Dict, body: Any, student_id: str):
+        info = self.manager.student_registry._update(student_id, body)
+        if info is None:
+            return 404, {'error': 'student not found'}
+        return 200, dict(info, student_id=student_id)
+        
+    def _delete_student(self, query: Dict, body: Any, student_id: str):
+        if self.manager.student_registry._remove(student_id) is None:
+            return 404, {'error': 'student not found'}
+        return 200, {'deleted': student_id}
+        
+    def _student_profile(self, query: Dict, body: Any, student_id: str):
+        profile = self.manager.student_profile(student_id)
+        if profile is None:
+            return 404, {'error': 'student not found'}
+        return 200, profile
+        
+    # --- Course scheduling ---
+    
+    def _get_course(self, query: Dict, body: Any, course_id: str):
+        scheduler = self.manager.course_scheduler
+        if course_id not in scheduler.course_capacity:
+            return 404, {'error': 'course not found'}
+        return 200, {'course_id': course_id,
+                     'capacity': scheduler.course_capacity[course_id],
+                     'students': list(scheduler.course_allocations.get(course_id, ())),
+                     'waitlist': scheduler.waitlist_for(course_id),
+                     'meetings': scheduler.course_meetings.get(course_id, [])}
+                     
+    def _timetable_conflicts(self, query: Dict, body: Any):
+        conflicts = self.manager.course_scheduler.find_conflicts()
+        return 200, [{'student_id': student_id, 'course_a': course_a, 'course_b': course_b}
+                     for student_id, course_a, course_b
+                     in itertools.islice(conflicts, int(query.get('limit', 100)))]
+                     
+    def _enrol(self, query: Dict, body: Any):
+        outcome = self.manager.course_scheduler._try_enrol(body['student_id'], body['course_id'])
+        status = {'enrolled': 201, 'waitlisted': 202, 'unknown_course': 404}.get(outcome, 409)
+        return status, {'outcome': outcome}
+        
+    def _drop(self, query: Dict, body: Any, course_id: str, student_id: str):
+        scheduler = self.manager.course_scheduler
+        if not (scheduler._drop(student_id, course_id)
+                or scheduler._leave_waitlist(student_id, course_id)):
+            return 404, {'error': 'not enrolled'}
+        return 200, {'dropped': student_id, 'course_id': course_id}
+        
+    def _queue_request(self, query: Dict, body: Any):
+        if not self.manager.course_scheduler._enqueue(body['student_id'], body['course_id']):
+            return 503, {'error': 'registration queue full'}
+        return 202, {'queued': len(self.manager.course_scheduler.registration_queue)}
+        
+    def _process_queue(self, query: Dict, body: Any):
+        scheduler = self.manager.course_scheduler
+        limit = body.get('limit')
+        outcomes = []
+        while limit is None or len(outcomes) < limit:
+            request = scheduler._next_request()
+            if request is None:
+                break
+            student_id, course_id = request
+            outcomes.append({'student_id': student_id, 'course_id': course_id,
+                             'outcome': scheduler._try_enrol(student_id, course_id)})
+        return 200, outcomes
+        
+    # --- Fee tracking ---
+    
+    def _list_payments(self, query: Dict, body: Any):
+        records = self.manager.fee_tracking.iter_payment_records(
+            query.get('start'), query.get('end'), query.get('status'))
+        return 200, list(itertools.islice(records, int(query.get('limit', 100))))
+        
+    def _add_payment(self, query: Dict, body: Any):
+        if not self.manager.fee_tracking._insert(body['student_id'], float(body['amount_paid']),
+                                                 float(body['total_fee'])):
+            return 409, {'error': 'payment record already exists'}
+        return 201, self.manager.fee_tracking._node_record(
+            self.manager.fee_tracking._search_node(body['student_id']))
+            
+    def _payment_totals(self, query: Dict, body: Any):
+        fees = self.manager.fee_tracking
+        if 'start' in query or 'end' in query:
+            return 200, fees.range_totals(query.get('start'), query.get('end'))
+        return 200, fees.fee_totals()
+        
+    def _top_debtors(self, query: Dict, body: Any):
+        return 200, self.manager.fee_tracking.top_debtors(int(query.get('k', 10)))
+        
+    def _get_payment(self, query: Dict, body: Any, student_id: str):
+        node = self.manager.fee_tracking._search_node(student_id)
+        if node is None:
+            return 404, {'error': 'payment record not found'}
+        return 200, PaymentRecord(node)
+        
+    def _set_payment(self, query: Dict, body: Any, student_id: str):
+        fees = self.manager.fee_tracking
+        node = fees._search_node(student_id)
+        if node is None:
+            return 404, {'error': 'payment record not found'}
+        fees._apply_payment(student_id, float(body['amount_paid']), absolute=True)
+        return 200, PaymentRecord(node)
+        
+    def _delete_payment(self, query: Dict, body: Any, student_id: str):
+        if self.manager.fee_tracking._delete(student_id) is None:
+            return 404, {'error': 'payment record not found'}
+        return 200, {'deleted': student_id}
+        
+    def _record_payment(self, query: Dict, body: Any, student_id: str):
+        node = self.manager.fee_tracking._apply_payment(student_id, float(body['amount']))
+        if node is None:
+            return 404, {'error': 'payment record not found'}
+        return 201, PaymentRecord(node)
+        
+    # --- Library ---
+    
+    def _search_books(self, query: Dict, body: Any):
+        matches = self.manager.library_system.search_books(query.get('q', ''),
+                                                           int(query.get('limit', 10)))
+        return 200, [{'isbn': isbn, 'title': title} for isbn, title in matches]
+        
+    def _add_book(self, query: Dict, body: Any):
+        self.manager.library_system._catalogue(body['isbn'], body['title'], int(body['copies']))
+        return 201, {'isbn': body['isbn']}
+        
+    def _get_book(self, query: Dict, body: Any, isbn: str):
+        book = self.manager.library_system.books.get(isbn)
+        if book is None:
+            return 404, {'error': 'book not found'}
+        return 200, {'isbn': isbn, 'title': book['title'],
+                     'total_copies': book['total_copies'],
+                     'available_copies': book['available_copies'],
+                     'borrowers': dict(book['borrowers'])}
+                     
+    def _list_loans(self, query: Dict, body: Any):
+        return 200, self.manager.library_system.loans_for_student(query.get('student_id', ''))
+        
+    def _overdue_loans(self, query: Dict, body: Any):
+        now = float(query['now']) if 'now' in query else None
+        return 200, self.manager.library_system.overdue_loans(now)
+        
+    def _borrow(self, query: Dict, body: Any):
+        outcome = self.manager.library_system._lend(body['isbn'], body['student_id'],
+                                                    due_at=body.get('due_at'))
+        status = {'borrowed': 201, 'not_found': 404}.get(outcome, 409)
+        return status, {'outcome': outcome}
+        
+    def _return(self, query: Dict, body: Any):
+        outcome = self.manager.library_system._take_back(body['isbn'], body['student_id'])
+        status = {'returned': 200, 'not_found': 404}.get(outcome, 409)
+        return status, {'outcome': outcome}
+        
+    # --- Performance analytics ---
+    
+    def _top_performers(self, query: Dict, body: Any):
+        return 200, [{'student_id': student_id, 'average': average} for student_id, average
+                     in self.manager.performance_analytics.top_k(int(query.get('k', 10)))]
+                     
+    def _get_performance(self, query: Dict, body: Any, student_id: str):
+        analytics = self.manager.performance_analytics
+        details = analytics.student_scores.get(student_id)
+        if details is None:
+            return 404, {'error': 'performance record not found'}
+        return 200, {'student_id': student_id, 'scores': details['scores'],
+                     'average': details['average'], 'rank': analytics.rank_of(student_id),
+                     'percentile': analytics.percentile(student_id)}
+                     
+    def _set_performance(self, query: Dict, body: Any, student_id: str):
+        scores_list = [float(score) for score in body['scores']]
+        if not scores_list:
+            return 400, {'error': 'no scores given'}
+        self.manager.performance_analytics._store_record(student_id, scores_list)
+        return self._get_performance(query, body, student_id)
+        
+    def _delete_performance(self, query: Dict, body: Any, student_id: str):
+        analytics = self.manager.performance_analytics
+        if student_id not in analytics.student_scores:
+            return 404, {'error': 'performance record not found'}
+        analytics._drop_record(student_id)
+        return 200, {'deleted': student_id}
+        
+    # --- Monitoring ---
+    
+    def _get_metrics(self, query: Dict, body: Any):
+        if query.get('format') == 'json':
+            return 200, self.manager.metrics()
+        # A str payload is sent as plain text
+        return 200, self.manager.prometheus_metrics()
+        
+    # --- HTTP plumbing ---
+    
+    def _dispatch(self, method: str, target: str, raw_body: bytes) -> Tuple[int, Any]:
+        path, _, query_string = target.partition('?')
+        query = {name: values[-1] for name, values in urllib.parse.parse_qs(query_string).items()}
+        try:
+            body = json.loads(raw_body) if raw_body else {}
+        except ValueError:
+            return 400, {'error': 'request body is not valid JSON'}
+        # Every handler reads named fields, so anything but an object is refused here
+        if not isinstance(body, dict):
+            return 400, {'error': 'request body must be a JSON object'}
+            
+        path_found = False
+        for route_method, pattern, handler in self._routes:
+            match = pattern.fullmatch(path)
+            if match is None:
+                continue
+            path_found = True
+            if route_method != method:
+                continue
+            args = [urllib.parse.unquote(arg) for arg in match.groups()]
+            metrics = self.manager._metrics
+            if metrics is not None:
+                handler = metrics.wrap('http', handler, handler.__name__.lstrip('_'))
+            try:
+                return handler(query, body, *args)
+            except (KeyError, TypeError, ValueError) as error:
+                return 400, {'error': f"bad request: {error!r}"}
+        if path_found:
+            return 405, {'error': f"{method} not allowed on {path}"}
+        return 404, {'error': f"no such endpoint: {path}"}
+        
+    async def _handle_connection(self, reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                raw_body = await reader.readexactly(length) if length else b""
+                
+                try:
+                    status, payload = self._dispatch(method, target, raw_body)
+                except Exception as error:
+                    # A bug in one handler mustn't take the connection down with it
+                    self.manager.output.emit('server_error', "Error handling {method} {target}: {error!r}",
+                                             method=method, target=target, error=error)
+                    status, payload = 500, {'error': f"internal error: {error!r}"}
+                if isinstance(payload, str):
+                    data = payload.encode()
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    data = json.dumps(payload, default=_to_json).encode()
+                    content_type = "application/json"
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get('connection', '').lower() != 'close')
+                writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                             f"Content-Type: {content_type}\r\n"
+                             f"Content-Length: {len(data)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                             f"\r\n".encode('latin-1') + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # malformed request or client went away; just hang up
+        finally:
+            writer.close()
+            
+    async def start(self) -> int:
+        """
+        Load every module, then start listening; returns the port (useful
+        when asked for port 0).
+        """
+        manager = self.manager
+        await asyncio.get_running_loop().run_in_executor(
+            None, lambda: [getattr(manager, name) for name in SchoolManager.MODULES])
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+        
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        
+    def serve_forever(self):
+        """Run the server until interrupted, then save and close the manager."""
+        async def main():
+            port = await self.start()
+            print(f"Serving the School Management System on http://{self.host}:{port}", flush=True)
+            await self._server.serve_forever()
+            
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.manager.close()
+
+
 if __name__ == "__main__":
-    # Start up the school management system
-    school_manager = SchoolManager()
-    school_manager.run()
\ No newline at end of file
+    # Start up the school management system, optionally backed by a database file.
+    # With --serve[=PORT] it runs the JSON API (SchoolServer) instead of the menus,
+    # and --metrics times every module operation (see GET /metrics).
+    args = sys.argv[1:]
+    serve = [arg for arg in args if arg.startswith('--serve')]
+    metrics = '--metrics' in args
+    args = [arg for arg in args if not arg.startswith('--serve') and arg != '--metrics']
+    # The server answers in JSON, so it has no use for console messages
+    school_manager = SchoolManager(args[0] if args else None,
+                                   output=NullSink() if serve else None, metrics=metrics)
+    if serve:
+        port = int(serve[0].partition('=')[2] or 8080)
+        SchoolServer(school_manager, port=port).serve_forever()
+    else:
+        school_manager.run()
\ No newline at end of file